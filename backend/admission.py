@@ -0,0 +1,137 @@
+"""
+Admission control for graph executions.
+
+Each API key has its own token bucket. Admitted requests either start right
+away (while fewer than `max_running` graphs are executing) or wait in a
+bounded FIFO queue. A full queue or an empty bucket is rejected immediately
+with a Retry-After estimate, instead of piling up work.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, detail, retry_after):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate_per_sec, burst):
+        self.rate = rate_per_sec
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Take one token. Returns 0 on success, otherwise seconds until a token is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class Ticket:
+    def __init__(self, controller):
+        self.controller = controller
+        self.admitted = False
+        self.released = False
+        self.started = None
+        self.ready = asyncio.Event()
+
+    async def wait(self, interval=1.0):
+        """Yield the queue position periodically until admitted; raises QueueTimeout past the deadline."""
+        deadline = time.monotonic() + self.controller.queue_timeout
+        while not self.admitted:
+            yield self.controller.position(self)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.controller.stats["queue_timeouts"] += 1
+                raise QueueTimeout(f"Waited {self.controller.queue_timeout:.0f}s in the queue")
+            try:
+                await asyncio.wait_for(self.ready.wait(), min(interval, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self):
+        self.controller.release(self)
+
+
+class AdmissionController:
+    def __init__(self, max_running=64, max_queue=128, queue_timeout=60.0, rate_per_minute=30, burst=10):
+        self.max_running = max_running
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate_per_sec = rate_per_minute / 60.0
+        self.burst = burst
+        self.running = 0
+        self.queue = deque()
+        self.buckets = {}
+        self.avg_run_seconds = 10.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected_rate": 0, "rejected_queue": 0, "queue_timeouts": 0}
+
+    def check_rate(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate_per_sec, self.burst)
+        wait = bucket.take()
+        if wait:
+            self.stats["rejected_rate"] += 1
+            raise AdmissionRejected("Rate limit exceeded for this API key.", wait)
+
+    def admit(self):
+        """Start now or join the queue. Raises AdmissionRejected if the queue is full."""
+        ticket = Ticket(self)
+        if self.running < self.max_running and not self.queue:
+            self._start(ticket)
+        elif len(self.queue) >= self.max_queue:
+            self.stats["rejected_queue"] += 1
+            raise AdmissionRejected("Server is at capacity, try again shortly.", self.estimated_wait(len(self.queue)))
+        else:
+            self.stats["queued"] += 1
+            self.queue.append(ticket)
+        return ticket
+
+    def position(self, ticket):
+        try:
+            return self.queue.index(ticket) + 1
+        except ValueError:
+            return 0
+
+    def estimated_wait(self, position):
+        return self.avg_run_seconds * (position + 1) / self.max_running
+
+    def release(self, ticket):
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.admitted:
+            self.running -= 1
+            if ticket.started is not None:
+                # EWMA of run time, used for Retry-After estimates
+                self.avg_run_seconds = 0.9 * self.avg_run_seconds + 0.1 * (time.monotonic() - ticket.started)
+        elif ticket in self.queue:
+            self.queue.remove(ticket)
+        while self.running < self.max_running and self.queue:
+            self._start(self.queue.popleft())
+
+    def _start(self, ticket):
+        self.running += 1
+        self.stats["admitted"] += 1
+        ticket.admitted = True
+        ticket.started = time.monotonic()
+        ticket.ready.set()
+
+    def snapshot(self):
+        return {**self.stats, "running": self.running, "waiting": len(self.queue),
+                "avg_run_seconds": round(self.avg_run_seconds, 3)}
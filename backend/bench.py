@@ -0,0 +1,333 @@
+"""
+Offline benchmark for /ask_stream.
+
+Replaces ChatGroq and the Arxiv/Wikipedia/Tavily tools with deterministic
+local fakes with configurable latency and payload size. It then serves the
+real FastAPI app with uvicorn on loopback and drives /ask_stream at
+increasing concurrency. No network access is needed.
+
+Reports p50/p95/p99 latency, throughput, time to first event and memory per
+session. Results can be saved as a baseline and compared on later runs.
+
+    python bench.py --concurrency 1 8 32 --save-baseline bench_baseline.json
+    python bench.py --concurrency 1 8 32 --baseline bench_baseline.json --tolerance 0.2
+    python bench.py --concurrency 1 --batch 40      # sequential vs /ask_batch throughput
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+TOOL_NAMES = ["wikipedia", "arxiv", "tavily_search_results_json"]
+
+
+class FakeChatModel(BaseChatModel):
+    """Calls the bound tools for `tool_rounds` rounds, then streams a fixed-length answer."""
+
+    first_token_latency: float = 0.2
+    token_interval: float = 0.005
+    answer_tokens: int = 80
+    tool_rounds: int = 1
+    calls_per_round: int = 2
+    # Call tools with the bare user query, as real models mostly do on a turn's first step
+    plain_query: bool = False
+    bound_tools: list = []
+    schema_tokens: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-bench"
+
+    def bind_tools(self, tools, **kwargs):
+        # Tool schemas are part of every prompt, so they count towards input tokens like on a real model
+        schemas = [convert_to_openai_tool(t) for t in tools]
+        return self.model_copy(update={
+            "bound_tools": [s["function"]["name"] for s in schemas],
+            "schema_tokens": len(json.dumps(schemas)) // 4,
+        })
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._result(self._stream(messages, stop=stop, **kwargs))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._result([chunk async for chunk in self._astream(messages, stop=stop, **kwargs)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for _, chunk in self._reply(messages):
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for delay, chunk in self._reply(messages):
+            if delay:
+                await asyncio.sleep(delay)
+            yield chunk
+
+    @staticmethod
+    def _result(chunks):
+        message = None
+        for chunk in chunks:
+            message = chunk.message if message is None else message + chunk.message
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(
+            content=message.content, tool_calls=message.tool_calls, usage_metadata=message.usage_metadata,
+        ))])
+
+    def _reply(self, messages):
+        """The reply as (seconds to wait before it, chunk); the sync path skips the waits."""
+        turn_start = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        query = messages[turn_start].content
+        rounds = sum(1 for m in messages[turn_start:] if isinstance(m, AIMessage) and m.tool_calls)
+        usage = {"input_tokens": sum(len(str(m.content)) for m in messages) // 4 + self.schema_tokens,
+                 "output_tokens": 0, "total_tokens": 0}
+
+        names = [n for n in TOOL_NAMES if n in self.bound_tools]
+        if names and rounds < self.tool_rounds:
+            calls = [
+                {"name": names[(rounds + i) % len(names)],
+                 "args": json.dumps({"query": query if self.plain_query else f"{query} {i}"}),
+                 "id": f"call_{rounds}_{i}", "index": i}
+                for i in range(self.calls_per_round)
+            ]
+            yield self.first_token_latency, ChatGenerationChunk(
+                message=AIMessageChunk(content="", tool_call_chunks=calls, usage_metadata=usage))
+            return
+
+        for i in range(self.answer_tokens):
+            delay = self.token_interval if i else self.first_token_latency
+            yield delay, ChatGenerationChunk(message=AIMessageChunk(content=f"token{i} "))
+        usage["output_tokens"] = usage["total_tokens"] = self.answer_tokens
+        yield 0, ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+
+class FakeTool:
+    """Blocking tool stand-in returning a payload shaped like the real tool's output."""
+
+    def __init__(self, name, latency, payload_chars):
+        self.name = name
+        self.latency = latency
+        self.payload_chars = payload_chars
+
+    def invoke(self, kwargs):
+        time.sleep(self.latency)
+        query = kwargs.get("query", "")
+        body = ("lorem ipsum dolor sit amet " * (self.payload_chars // 27 + 1))[:self.payload_chars]
+        if self.name == "tavily_search_results_json":
+            return [
+                {"title": f"{query} result {i}", "url": f"https://example.com/{abs(hash(query))}/{i}", "content": body}
+                for i in range(5)
+            ]
+        if self.name == "arxiv":
+            return f"Published: 2024-01-01\nTitle: {query}\nAuthors: A. Author\nSummary: {body}"
+        return f"Page: {query}\nSummary: {body}"
+
+
+def load_app(args=None, llm=None, tool_impls=None, **env):
+    """
+    Import the backend with isolated state files and fake backends installed; returns the FastAPI app.
+
+    The fakes are built from this script's CLI `args`, or given as `llm` / `tool_impls`; with neither,
+    the real backends stay in place. `env` sets further settings before the import.
+    """
+    workdir = tempfile.mkdtemp(prefix="nexus-bench-")
+    os.environ.setdefault("NEXUS_API_KEY", "bench")
+    os.environ["TOOL_CACHE_PATH"] = os.path.join(workdir, "tool_cache.sqlite3")
+    os.environ["CHECKPOINT_PATH"] = os.path.join(workdir, "checkpoints.sqlite3")
+    os.environ["LOCAL_INDEX_PATH"] = os.path.join(workdir, "local_index")
+    # One benchmark key drives every session; keep per-key rate limiting out of the measurement
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "1000000")
+    os.environ.setdefault("RATE_LIMIT_BURST", "1000000")
+    if args is not None:
+        os.environ["COALESCE_QUERIES"] = "1" if args.coalesce else "0"
+        os.environ.setdefault("MAX_CONCURRENT_SESSIONS", str(max(args.concurrency + [args.batch_concurrency]) * 2))
+        llm = llm or FakeChatModel(
+            first_token_latency=args.llm_latency, token_interval=args.token_interval,
+            answer_tokens=args.answer_tokens, tool_rounds=args.tool_rounds, calls_per_round=args.calls_per_round,
+        )
+        tool_impls = tool_impls or {name: FakeTool(name, args.tool_latency, args.payload_chars) for name in TOOL_NAMES}
+    os.environ.update({k: str(v) for k, v in env.items()})
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import langgraph_agent
+
+    logging.getLogger("nexus").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if llm is not None or tool_impls:
+        langgraph_agent.use_backends(llm=llm, tool_impls=tool_impls)
+    return langgraph_agent.app
+
+
+def start_server(app):
+    import uvicorn
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.02)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def one_session(client, url, query):
+    start = time.perf_counter()
+    first_event = None
+    async with client.stream("POST", f"{url}/ask_stream", json={"query": query},
+                             headers={"X-Api-Key": os.environ["NEXUS_API_KEY"]}) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            # Server-sent events: only data lines carry events; ids, retry and heartbeats are skipped
+            if not line.startswith("data:"):
+                continue
+            event = json.loads(line[5:])
+            if first_event is None and event["type"] not in ("thread", "route"):
+                first_event = time.perf_counter() - start
+    return time.perf_counter() - start, first_event
+
+
+async def run_level(url, concurrency, sessions, tag):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    gate = asyncio.Semaphore(concurrency)
+
+    async def gated(i):
+        async with gate:
+            return await one_session(client, url, f"benchmark query {tag} {i}")
+
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(gated(i) for i in range(sessions)))
+        wall = time.perf_counter() - start
+    return results, wall
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def bench_level(url, concurrency, waves, measure_memory):
+    results, wall = asyncio.run(run_level(url, concurrency, concurrency * waves, f"c{concurrency}"))
+    latencies = [r[0] for r in results]
+    first_events = [r[1] for r in results if r[1] is not None]
+    row = {
+        "concurrency": concurrency,
+        "sessions": len(results),
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "throughput_rps": len(results) / wall,
+        "ttfe_p50_s": statistics.median(first_events) if first_events else None,
+        "mem_per_session_kb": None,
+    }
+    if measure_memory:
+        # Separate single-wave pass: tracemalloc slows allocation-heavy code, so it is not mixed with latency
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        asyncio.run(run_level(url, concurrency, concurrency, f"m{concurrency}"))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        row["mem_per_session_kb"] = (peak - base) / concurrency / 1024
+    return row
+
+
+async def run_batch(url, n, concurrency):
+    """Queries per minute for n queries sent one at a time through /ask_stream vs once through /ask_batch."""
+    headers = {"X-Api-Key": os.environ["NEXUS_API_KEY"]}
+    async with httpx.AsyncClient(timeout=None) as client:
+        start = time.perf_counter()
+        for i in range(n):
+            await one_session(client, url, f"sequential query {i}")
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        body = {"queries": [{"id": str(i), "query": f"batch query {i}"} for i in range(n)], "concurrency": concurrency}
+        async with client.stream("POST", f"{url}/ask_batch", json=body, headers=headers) as r:
+            r.raise_for_status()
+            async for _ in r.aiter_lines():
+                pass
+        batch = time.perf_counter() - start
+    return n * 60 / sequential, n * 60 / batch
+
+
+def compare(rows, baseline, tolerance):
+    """Return human-readable regressions of p95 latency or throughput beyond the tolerance."""
+    base_rows = {r["concurrency"]: r for r in baseline["results"]}
+    problems = []
+    for row in rows:
+        base = base_rows.get(row["concurrency"])
+        if base is None:
+            continue
+        if row["p95_s"] > base["p95_s"] * (1 + tolerance):
+            problems.append(f"c={row['concurrency']}: p95 {row['p95_s']:.3f}s vs baseline {base['p95_s']:.3f}s")
+        if row["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            problems.append(
+                f"c={row['concurrency']}: throughput {row['throughput_rps']:.2f}/s vs baseline {base['throughput_rps']:.2f}/s"
+            )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline /ask_stream benchmark with fake LLM and tools")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--waves", type=int, default=3, help="sessions per level = concurrency x waves")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds to first token per LLM call")
+    parser.add_argument("--token-interval", type=float, default=0.005)
+    parser.add_argument("--answer-tokens", type=int, default=80)
+    parser.add_argument("--tool-rounds", type=int, default=1)
+    parser.add_argument("--calls-per-round", type=int, default=2)
+    parser.add_argument("--tool-latency", type=float, default=0.3)
+    parser.add_argument("--payload-chars", type=int, default=2000)
+    parser.add_argument("--coalesce", action="store_true", help="leave query coalescing enabled")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc memory pass")
+    parser.add_argument("--batch", type=int, default=0, metavar="N", help="also compare N sequential queries with /ask_batch")
+    parser.add_argument("--batch-concurrency", type=int, default=8)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server, url = start_server(load_app(args))
+    rows = [bench_level(url, c, args.waves, not args.no_memory) for c in args.concurrency]
+    batch = asyncio.run(run_batch(url, args.batch, args.batch_concurrency)) if args.batch else None
+    server.should_exit = True
+
+    print(f"{'conc':>5} {'sess':>5} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'req/s':>7} {'ttfe s':>7} {'KB/sess':>8}")
+    for r in rows:
+        ttfe = f"{r['ttfe_p50_s']:.3f}" if r["ttfe_p50_s"] is not None else "-"
+        mem = f"{r['mem_per_session_kb']:.0f}" if r["mem_per_session_kb"] is not None else "-"
+        print(f"{r['concurrency']:>5} {r['sessions']:>5} {r['p50_s']:>7.3f} {r['p95_s']:>7.3f} {r['p99_s']:>7.3f} "
+              f"{r['throughput_rps']:>7.2f} {ttfe:>7} {mem:>8}")
+
+    if batch:
+        print(f"batch of {args.batch}: sequential {batch[0]:.1f} q/min, /ask_batch {batch[1]:.1f} q/min "
+              f"({batch[1] / batch[0]:.1f}x)")
+
+    config = {k: v for k, v in vars(args).items() if k not in ("save_baseline", "baseline", "tolerance")}
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"config": config, "results": rows}, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(rows, json.load(f), args.tolerance)
+        for p in problems:
+            print(f"REGRESSION {p}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
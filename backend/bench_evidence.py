@@ -0,0 +1,141 @@
+"""
+Offline benchmark for cross-tool evidence deduplication and re-ranking.
+
+Builds rounds of tool results shaped like the real tools' output in which
+the same documents come back several times: a Wikipedia article as a
+Wikipedia result and as a Tavily hit under its mobile URL, an arXiv paper
+as an Arxiv summary and as a Tavily /pdf/ link, a lightly edited mirror of
+an abstract on another site, next to off-topic results that share a query
+word. Each round goes through the agent's apply_token_budget with evidence
+selection off (per-result compaction with exact URL/title dedupe) and on,
+and reports forwarded items and tokens, duplicate copies forwarded,
+on-topic documents kept and the time the stage takes.
+
+    python bench_evidence.py --rounds 300
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+TOPIC_WORDS = 40
+BODY_WORDS = 120
+
+
+def make_topics(n, rng):
+    vocab = [f"{a}{b}" for a in ("qua", "neu", "gra", "pho", "cry", "lat", "spe", "the", "mol", "ato", "cel", "gen")
+             for b in ("ntum", "ron", "vity", "ton", "stal", "tice", "ctra", "rmal", "ecule", "mic", "lular", "ome",
+                       "sor", "ling", "ator", "rix")]
+    common = [f"common{i}" for i in range(300)]
+    topics = []
+    for t in range(n):
+        words = rng.sample(vocab, 3) + [f"t{t}w{i}" for i in range(TOPIC_WORDS)]
+        topics.append({"name": " ".join(words[:3]), "words": words})
+    return topics, common
+
+
+def document(topic, common, rng, kind, i):
+    body = " ".join(rng.choice(topic["words"] if rng.random() < 0.5 else common) for _ in range(BODY_WORDS))
+    title = f"{topic['name'].title()} {kind} {i}"
+    return {"title": title, "content": body}
+
+
+def edited(text, rng, share=0.1):
+    words = text.split()
+    for i in rng.sample(range(len(words)), int(len(words) * share)):
+        words[i] = "mirror"
+    return " ".join(words)
+
+
+def make_round(topics, common, rng):
+    """Tool results for one round, plus the ground-truth document id of every snippet prefix."""
+    topic, other = rng.sample(topics, 2)
+    wiki = document(topic, common, rng, "article", 0)
+    wiki_related = document(topic, common, rng, "article", 1)
+    paper = document(topic, common, rng, "paper", 0)
+    paper2 = document(topic, common, rng, "paper", 1)
+    distractors = [document(other, common, rng, "overview", i) for i in range(2)]
+    for d in distractors:
+        d["content"] = topic["words"][0] + " " + d["content"]
+    wiki_path = wiki["title"].replace(" ", "_")
+    arxiv_id = f"{rng.randint(1000, 2400)}.{rng.randint(10000, 99999)}"
+    off_topic = [{"title": d["title"], "url": f"https://example.com/{rng.randint(0, 10**9)}?utm_source=feed",
+                  "content": d["content"]} for d in distractors]
+    # Search engines interleave loosely matching pages with the good ones
+    tavily = [
+        {"title": wiki["title"] + " - Wikipedia", "url": f"https://en.m.wikipedia.org/wiki/{wiki_path}",
+         "content": wiki["content"]},
+        off_topic[0],
+        {"title": paper["title"], "url": f"http://arxiv.org/pdf/{arxiv_id}v2", "content": paper["content"]},
+        off_topic[1],
+        {"title": paper["title"] + " (mirror)", "url": f"https://mirror.example.org/{arxiv_id}",
+         "content": edited(paper["content"], rng)},
+    ]
+    arxiv = "\n\n".join(f"Published: 2024-01-01\nTitle: {d['title']}\nAuthors: A. Author\nSummary: {d['content']}"
+                        for d in (paper, paper2))
+    wikipedia = "\n\n".join(f"Page: {d['title']}\nSummary: {d['content']}" for d in (wiki, wiki_related))
+    truth = {}
+    for doc_id, d in enumerate((wiki, wiki_related, paper, paper2, *distractors)):
+        truth[" ".join(d["content"].split()[:8])] = (doc_id, d in distractors)
+    return topic["name"], [("tavily_search_results_json", json.dumps(tavily)), ("arxiv", arxiv),
+                           ("wikipedia", wikipedia)], truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evidence dedupe and re-ranking on/off comparison")
+    parser.add_argument("--rounds", type=int, default=300)
+    args = parser.parse_args()
+
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+    from bench import load_app
+
+    load_app()
+    import langgraph_agent
+    import token_budget
+
+    rng = random.Random(5)
+    topics, common = make_topics(50, rng)
+    rounds = [make_round(topics, common, rng) for _ in range(args.rounds)]
+
+    results = {}
+    for mode, rerank in (("off", False), ("on", True)):
+        langgraph_agent.EVIDENCE_RERANK = rerank
+        totals = {"raw_tokens": 0, "tokens": 0, "items": 0, "duplicate_copies": 0, "on_topic_docs": 0,
+                  "off_topic_items": 0}
+        timings = []
+        for name, outputs, truth in rounds:
+            calls = [{"name": tool, "args": {"query": name}, "id": f"call{i}"} for i, (tool, _) in enumerate(outputs)]
+            messages = [HumanMessage(content=f"What is {name}?"), AIMessage(content="", tool_calls=calls)]
+            tool_messages = [ToolMessage(content=content, name=tool, tool_call_id=f"call{i}")
+                             for i, (tool, content) in enumerate(outputs)]
+            start = time.perf_counter()
+            langgraph_agent.apply_token_budget(messages, tool_messages)
+            timings.append((time.perf_counter() - start) * 1000)
+            forwarded = []
+            for m in tool_messages:
+                totals["raw_tokens"] += m.response_metadata["raw_tokens"]
+                totals["tokens"] += token_budget.approx_tokens(m.content)
+                for it in m.response_metadata["sources"]:
+                    prefix = " ".join(it["snippet"].split()[:8])
+                    forwarded.append(truth.get(prefix, (None, False)))
+            ids = [doc_id for doc_id, _ in forwarded if doc_id is not None]
+            totals["items"] += len(forwarded)
+            totals["duplicate_copies"] += len(ids) - len(set(ids))
+            totals["on_topic_docs"] += len({doc_id for doc_id, off in forwarded if doc_id is not None and not off})
+            totals["off_topic_items"] += sum(off for _, off in forwarded)
+        totals["p50_ms"] = statistics.median(timings)
+        totals["p99_ms"] = sorted(timings)[int(0.99 * (len(timings) - 1))]
+        results[mode] = totals
+
+    print(f"{args.rounds} rounds of 3 tool results (9 items, 6 distinct documents, 4 on topic)\n")
+    print(f"{'per round':>17} {'rerank off':>11} {'rerank on':>10}")
+    for k in ("raw_tokens", "tokens", "items", "duplicate_copies", "on_topic_docs", "off_topic_items"):
+        print(f"{k:>17} {results['off'][k] / args.rounds:>11.1f} {results['on'][k] / args.rounds:>10.1f}")
+    for k in ("p50_ms", "p99_ms"):
+        print(f"{k:>17} {results['off'][k]:>11.2f} {results['on'][k]:>10.2f}")
+    print(f"\nevidence stats: {langgraph_agent.evidence_stats.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
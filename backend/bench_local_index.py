@@ -0,0 +1,120 @@
+"""
+Build and query benchmark for the local BM25 index.
+
+Generates a synthetic corpus of abstract-sized documents over a Zipf-
+distributed vocabulary, indexes it in flush-sized batches, then reports
+build throughput, on-disk size, cold open time, query latency and the cost
+of a live incremental append on the full index. Queries are a few terms
+drawn from one document, like a repeat of an earlier topic; hit@1 is how
+often that document ranks first.
+
+    python bench_local_index.py                       # 1M documents
+    python bench_local_index.py --docs 100000 --queries 500
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from local_index import LocalIndex, tokenize  # noqa: E402
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vi", "so", "de", "pa", "zu", "ho", "ri", "ge", "fa", "bo"]
+
+
+def vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def corpus(n, words, doc_tokens, rng):
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1 / rank
+        cum_weights.append(total)
+    for i in range(n):
+        yield {"title": " ".join(rng.choices(words, cum_weights=cum_weights, k=6)),
+               "url": f"https://example.org/doc/{i}",
+               "text": " ".join(rng.choices(words, cum_weights=cum_weights, k=doc_tokens)),
+               "source": "arxiv" if i % 2 else "wikipedia"}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def build(path, args, words, rng):
+    index = LocalIndex(path, flush_docs=args.batch)
+    start = time.perf_counter()
+    for i, doc in enumerate(corpus(args.docs, words, args.doc_tokens, rng), 1):
+        index.add([doc])
+        if i % 100_000 == 0:
+            print(f"  indexed {i:,} docs ({time.perf_counter() - start:.0f}s)", flush=True)
+    index.close()
+    build_s = time.perf_counter() - start
+    stats = index.snapshot()
+    print(f"build:   {args.docs:,} docs in {build_s:.1f}s ({args.docs / build_s:,.0f} docs/s), "
+          f"{stats['flushes']} flushes, {stats['merges']} merges, {stats['segments']} segments, "
+          f"{index.disk_bytes() / 2**20:.0f} MiB on disk")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local BM25 index build and query benchmark")
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--doc-tokens", type=int, default=80, help="words per document body")
+    parser.add_argument("--batch", type=int, default=20_000, help="documents per flushed segment while building")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--query-terms", type=int, default=3)
+    parser.add_argument("--path", help="index directory (default: a temporary one, removed afterwards); "
+                                       "an index already there is queried without rebuilding")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    path = args.path or tempfile.mkdtemp(prefix="nexus-local-index-")
+    words = vocabulary(args.vocab, rng)
+    try:
+        if not os.path.exists(os.path.join(path, "manifest.json")):
+            build(path, args, words, rng)
+        start = time.perf_counter()
+        index = LocalIndex(path, flush_docs=64)
+        print(f"open:    {(time.perf_counter() - start) * 1000:.0f} ms cold")
+
+        probes = rng.sample(range(len(index)), min(args.queries, len(index)))
+        latencies = []
+        hits = 0
+        for doc_id in probes:
+            terms = tokenize(index._document(doc_id, len(index), [])["text"])
+            query = " ".join(rng.sample(terms, min(args.query_terms, len(terms))))
+            t0 = time.perf_counter()
+            results = index.search(query, 3)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            hits += bool(results) and results[0]["url"] == f"https://example.org/doc/{doc_id}"
+        print(f"query:   p50 {percentile(latencies, 0.5):.1f} ms  p95 {percentile(latencies, 0.95):.1f} ms  "
+              f"p99 {percentile(latencies, 0.99):.1f} ms  mean {statistics.mean(latencies):.1f} ms  "
+              f"hit@1 {hits / len(probes):.2%}")
+
+        appends = []
+        for doc in corpus(64 * 8, words, args.doc_tokens, random.Random(11)):
+            doc["url"] += f"/live/{time.time_ns()}"
+            t0 = time.perf_counter()
+            index.add([doc])
+            appends.append((time.perf_counter() - t0) * 1000)
+        print(f"append:  p50 {percentile(appends, 0.5):.2f} ms per doc, "
+              f"max {max(appends):.0f} ms (a flush of 64 docs; merges run in the background)")
+        index.close()
+    finally:
+        if not args.path:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
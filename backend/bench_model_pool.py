@@ -0,0 +1,123 @@
+"""
+Failover and latency-routing benchmark for the LLM pool, against local stub servers.
+
+Starts two stub_server.py instances: "primary" is reached through the Groq
+client and "local" through the OpenAI-compatible client, both configured via
+LLM_BACKENDS exactly as in production. The primary is then degraded phase by
+phase through /stub/config (slow, stalled, rate-limited, recovered) while
+chat calls run through the pool. The same phases are replayed against the
+primary alone for comparison.
+
+    python bench_model_pool.py --requests 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+PHASES = [
+    ("healthy", {"latency": 0.05, "error_rate": 0}),
+    ("slow", {"latency": 0.6, "error_rate": 0}),
+    ("stalled", {"latency": 5.0, "error_rate": 0}),
+    ("rate-limited", {"latency": 0.05, "error_rate": 1}),
+    ("recovered", {"latency": 0.05, "error_rate": 0}),
+]
+LOCAL_LATENCY = 0.15
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(port, latency):
+    env = {**os.environ, "STUB_LATENCY": str(latency)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "stub_server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stub/stats", timeout=0.5)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"stub server on port {port} did not start")
+
+
+async def run_phase(agent, llm, n):
+    from langchain_core.messages import HumanMessage
+
+    latencies, errors, served = [], 0, {}
+    for i in range(n):
+        start = time.perf_counter()
+        try:
+            response = await llm.ainvoke([HumanMessage(content=f"benchmark question {i}")])
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        backend = response.response_metadata.get("llm_backend", "?")
+        served[backend] = served.get(backend, 0) + 1
+    return latencies, errors, served
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM pool failover benchmark against local stub servers")
+    parser.add_argument("--requests", type=int, default=30, help="chat calls per phase")
+    parser.add_argument("--first-token-timeout", type=float, default=1.0)
+    args = parser.parse_args()
+
+    primary_port, local_port = free_port(), free_port()
+    stubs = [start_stub(primary_port, PHASES[0][1]["latency"]), start_stub(local_port, LOCAL_LATENCY)]
+    import logging
+    from bench import load_app
+
+    load_app(GROQ_API_KEY="stub", LLM_COOLDOWN=1, LLM_EXPLORE_EVERY=5)
+    import langgraph_agent
+
+    logging.getLogger("nexus").setLevel(logging.ERROR)
+    primary = {"name": "primary", "provider": "groq", "model": "stub", "base_url": f"http://127.0.0.1:{primary_port}",
+               "first_token_timeout_s": args.first_token_timeout}
+    local = {"name": "local", "provider": "openai", "model": "stub", "base_url": f"http://127.0.0.1:{local_port}/v1",
+             "first_token_timeout_s": args.first_token_timeout}
+
+    async def run(backends):
+        os.environ["LLM_BACKENDS"] = json.dumps(backends)
+        langgraph_agent.get_llm.cache_clear()
+        llm = langgraph_agent.get_llm()
+        rows = []
+        for phase, config in PHASES:
+            httpx.post(f"http://127.0.0.1:{primary_port}/stub/config", json=config)
+            rows.append((phase, *await run_phase(langgraph_agent, llm, args.requests)))
+        return rows, llm.snapshot()
+
+    try:
+        pooled, pool_stats = asyncio.run(run([primary, local]))
+        single, _ = asyncio.run(run([primary]))
+    finally:
+        for proc in stubs:
+            proc.terminate()
+
+    print(f"{args.requests} calls per phase; local backend {LOCAL_LATENCY}s; first-token timeout {args.first_token_timeout}s\n")
+    print(f"{'phase':>13} | {'pool p50':>8} {'p95':>6} {'errors':>6}  {'served by':<22} | "
+          f"{'single p50':>10} {'p95':>6} {'errors':>6}")
+    for (phase, lat, err, served), (_, s_lat, s_err, _) in zip(pooled, single):
+        def q(values, p):
+            return f"{sorted(values)[int(p * (len(values) - 1))]:.2f}" if values else "-"
+        by = ", ".join(f"{k} {v}" for k, v in sorted(served.items()))
+        print(f"{phase:>13} | {q(lat, 0.5):>8} {q(lat, 0.95):>6} {err:>6}  {by:<22} | "
+              f"{q(s_lat, 0.5):>10} {q(s_lat, 0.95):>6} {s_err:>6}")
+    print(f"\npool stats: {pool_stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Offline benchmark for speculative tool prefetch.
+
+Runs bench_router.py's labelled query mix through the real graph twice,
+with speculation off and on, using bench.py's fake LLM and tools. The fake
+LLM calls tools with the bare user query on its first step, like a real
+model usually does, and the tool cache is disabled so both runs make the
+same upstream calls. Reports request latency, upstream tool calls and the
+prefetch hit rate and wasted calls.
+
+    python bench_prefetch.py --llm-latency 0.4 --tool-latency 0.4
+"""
+import argparse
+import json
+import os
+import statistics
+
+
+def run_mix(client, key, queries, speculative):
+    totals = []
+    for query in queries:
+        r = client.post("/ask_stream", json={"query": query, "speculative": speculative}, headers={"X-Api-Key": key})
+        r.raise_for_status()
+        for line in r.text.splitlines():
+            if not line.startswith("data:"):
+                continue
+            event = json.loads(line[5:])
+            if event["type"] == "stats":
+                totals.append(event["data"]["total_ms"])
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speculative prefetch on/off comparison with fake LLM and tools")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tool-latency", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=2, help="passes over the query mix per mode")
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from bench import FakeChatModel, FakeTool, TOOL_NAMES, load_app
+    from bench_router import QUERIES
+
+    class CountingTool(FakeTool):
+        calls = 0
+
+        def invoke(self, kwargs):
+            CountingTool.calls += 1
+            return super().invoke(kwargs)
+
+    # Both modes must pay for every upstream call, so nothing may be served from the cache
+    app = load_app(
+        llm=FakeChatModel(first_token_latency=args.llm_latency, token_interval=0, answer_tokens=20, plain_query=True),
+        tool_impls={name: CountingTool(name, args.tool_latency, 1000) for name in TOOL_NAMES},
+        COALESCE_QUERIES=0, HEDGE_TOOLS=0, TOOL_CACHE_TTL_ARXIV=0, TOOL_CACHE_TTL_WIKI=0, TOOL_CACHE_TTL_TAVILY=0,
+    )
+    import langgraph_agent
+
+    queries = [q for q, _ in QUERIES] * args.repeat
+    key = os.environ["NEXUS_API_KEY"]
+    results = {}
+    with TestClient(app) as client:
+        for mode, speculative in (("off", False), ("on", True)):
+            calls_before = CountingTool.calls
+            totals = run_mix(client, key, queries, speculative)
+            results[mode] = {"mean_ms": statistics.mean(totals), "p50_ms": statistics.median(totals),
+                             "upstream_calls": CountingTool.calls - calls_before}
+
+    print(f"{len(queries)} requests per mode, LLM {args.llm_latency}s, tools {args.tool_latency}s\n")
+    print(f"{'':>15} {'spec off':>9} {'spec on':>9} {'change':>8}")
+    for k in ("mean_ms", "p50_ms", "upstream_calls"):
+        off, on = results["off"][k], results["on"][k]
+        change = (on - off) / off * 100 if off else 0
+        print(f"{k:>15} {off:>9.0f} {on:>9.0f} {change:>7.1f}%")
+    print(f"\nprefetch stats: {langgraph_agent.prefetch_stats.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Offline benchmark for the query router.
+
+Runs a labelled mix of queries through the real graph twice, with the router
+off and on, using bench.py's fake LLM and tools. The fake LLM calls tools
+only when some are bound and counts bound tool schemas as prompt tokens, so
+the comparison shows the LLM calls, tool calls and prompt tokens the router
+saves. Also reports routing accuracy against the labels and the router's
+own cost per query.
+
+    python bench_router.py
+"""
+import argparse
+import json
+import os
+import time
+
+QUERIES = [
+    ("hi", "direct"),
+    ("Thanks, that helps!", "direct"),
+    ("how are you?", "direct"),
+    ("what is 17 * 23?", "direct"),
+    ("Translate to French: the experiment finished ahead of schedule and under budget.", "direct"),
+    ("Summarize: retrieval augmented generation combines a retriever with a generator model.", "direct"),
+    ("recent papers on diffusion models for video", "subset"),
+    ("arxiv preprints about mixture of experts", "subset"),
+    ("survey of graph neural network benchmarks", "subset"),
+    ("latest news on fusion energy", "subset"),
+    ("what happened in the election yesterday", "subset"),
+    ("current price of bitcoin", "subset"),
+    ("who was Ada Lovelace", "subset"),
+    ("history of the printing press", "subset"),
+    ("capital of Australia", "subset"),
+    ("explain how transformers work", "all"),
+    ("compare rust and go for backend services", "all"),
+    ("why is the sky blue", "all"),
+]
+
+
+def run_mix(client, key, agent, enabled):
+    agent.QUERY_ROUTER = enabled
+    calls_before = agent.tool_stats["calls"]
+    llm_calls = prompt_tokens = 0
+    for query, _ in QUERIES:
+        r = client.post("/ask_stream", json={"query": query}, headers={"X-Api-Key": key})
+        r.raise_for_status()
+        for line in r.text.splitlines():
+            if not line.startswith("data:"):
+                continue
+            event = json.loads(line[5:])
+            if event["type"] == "stats":
+                llm_calls += event["data"]["iterations"]
+                prompt_tokens += sum(event["data"]["prompt_tokens"])
+    return {
+        "llm_calls": llm_calls,
+        "tool_calls": agent.tool_stats["calls"] - calls_before,
+        "prompt_tokens": prompt_tokens,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Router on/off comparison with fake LLM and tools")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--tool-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    import router
+
+    wrong = [(q, expected, router.route(q)["kind"]) for q, expected in QUERIES if router.route(q)["kind"] != expected]
+    start = time.perf_counter()
+    for _ in range(1000):
+        for q, _ in QUERIES:
+            router.route(q)
+    per_query_us = (time.perf_counter() - start) / (1000 * len(QUERIES)) * 1e6
+    print(f"routing: {len(QUERIES) - len(wrong)}/{len(QUERIES)} as labelled, {per_query_us:.1f} µs/query")
+    for q, expected, got in wrong:
+        print(f"  {q!r}: expected {expected}, got {got}")
+
+    from fastapi.testclient import TestClient
+    from bench import FakeChatModel, FakeTool, TOOL_NAMES, load_app
+
+    app = load_app(
+        llm=FakeChatModel(first_token_latency=args.llm_latency, token_interval=0, answer_tokens=20),
+        tool_impls={name: FakeTool(name, args.tool_latency, 1000) for name in TOOL_NAMES},
+        COALESCE_QUERIES=0,
+    )
+    import langgraph_agent
+
+    with TestClient(app) as client:
+        off = run_mix(client, os.environ["NEXUS_API_KEY"], langgraph_agent, False)
+        on = run_mix(client, os.environ["NEXUS_API_KEY"], langgraph_agent, True)
+
+    print(f"\n{'':>14} {'router off':>11} {'router on':>10} {'change':>8}")
+    for k in ("llm_calls", "tool_calls", "prompt_tokens"):
+        change = (on[k] - off[k]) / off[k] * 100 if off[k] else 0
+        print(f"{k:>14} {off[k]:>11} {on[k]:>10} {change:>7.1f}%")
+    print(f"\nrouting stats: {langgraph_agent.route_stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Cold-start benchmark for the backend.
+
+Spawns fresh interpreters that import langgraph_agent and serve one /health
+request, and reports import-to-ready time. Use --max-seconds in CI to fail
+when startup regresses past a budget.
+
+    python bench_startup.py --runs 5 --max-seconds 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import time
+start = time.perf_counter()
+import langgraph_agent
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+assert TestClient(langgraph_agent.app).get("/health").status_code == 200
+ready = time.perf_counter()
+print(f"{imported - start:.4f} {ready - start:.4f}")
+"""
+
+
+def measure_once():
+    env = dict(os.environ)
+    env.setdefault("NEXUS_API_KEY", "bench")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True,
+    )
+    imported, ready = out.stdout.strip().splitlines()[-1].split()
+    return float(imported), float(ready)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-to-ready benchmark for langgraph_agent")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail if median import-to-ready exceeds this")
+    args = parser.parse_args()
+
+    samples = [measure_once() for _ in range(args.runs)]
+    imports = [s[0] for s in samples]
+    readies = [s[1] for s in samples]
+    print(f"import   median {statistics.median(imports):.3f}s  max {max(imports):.3f}s")
+    print(f"ready    median {statistics.median(readies):.3f}s  max {max(readies):.3f}s")
+
+    if args.max_seconds is not None and statistics.median(readies) > args.max_seconds:
+        print(f"FAIL: import-to-ready exceeds budget of {args.max_seconds:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
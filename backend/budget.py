@@ -0,0 +1,75 @@
+"""
+Per-request execution budgets: a wall-clock deadline and a cap on LLM steps.
+
+Defaults come from REQUEST_DEADLINE_S and MAX_STEPS. KEY_BUDGETS overrides
+them per API key, e.g. '{"<key>": {"deadline_s": 20, "max_steps": 4}}', and
+a request may tighten (never loosen) its key's budget. When the budget is
+nearly spent the graph stops calling tools and answers with what it has;
+ANSWER_RESERVE_S is the time kept back for that final answer.
+"""
+import json
+import os
+import time
+
+
+class Budget:
+    def __init__(self, deadline_s, max_steps, answer_reserve_s):
+        self.deadline_s = deadline_s
+        self.max_steps = max_steps
+        self.answer_reserve_s = min(answer_reserve_s, deadline_s / 2)
+        self.deadline = None
+
+    def start(self):
+        self.deadline = time.monotonic() + self.deadline_s
+        return self
+
+    def remaining(self):
+        if self.deadline is None:
+            return self.deadline_s
+        return self.deadline - time.monotonic()
+
+    def research_time(self):
+        """Seconds left for LLM steps and tools before the answer reserve."""
+        return max(0.0, self.remaining() - self.answer_reserve_s)
+
+    def exhausted(self, steps):
+        """Reason to answer now ("steps" or "deadline"), or None. `steps` counts LLM calls so far."""
+        if steps + 1 >= self.max_steps:
+            return "steps"
+        if self.research_time() <= 0:
+            return "deadline"
+        return None
+
+    def limits(self):
+        return {"deadline_s": self.deadline_s, "max_steps": self.max_steps}
+
+
+class BudgetPolicy:
+    def __init__(self, deadline_s=45.0, max_steps=6, answer_reserve_s=8.0, per_key=None):
+        self.deadline_s = deadline_s
+        self.max_steps = max_steps
+        self.answer_reserve_s = answer_reserve_s
+        self.per_key = per_key or {}
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        return cls(
+            deadline_s=float(env("REQUEST_DEADLINE_S", "45")),
+            max_steps=int(env("MAX_STEPS", "6")),
+            answer_reserve_s=float(env("ANSWER_RESERVE_S", "8")),
+            per_key=json.loads(env("KEY_BUDGETS", "{}")),
+        )
+
+    def for_request(self, api_key, deadline_s=None, max_steps=None):
+        """Budget for one request: the key's limits, tightened by the request's own."""
+        key_limits = self.per_key.get(api_key, {})
+        deadline = float(key_limits.get("deadline_s", self.deadline_s))
+        steps = int(key_limits.get("max_steps", self.max_steps))
+        if deadline_s is not None:
+            deadline = min(deadline, float(deadline_s))
+        if max_steps is not None:
+            steps = min(steps, int(max_steps))
+        if deadline <= 0 or steps < 1:
+            raise ValueError("deadline_s must be positive and max_steps at least 1")
+        return Budget(deadline, steps, self.answer_reserve_s)
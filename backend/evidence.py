@@ -0,0 +1,181 @@
+"""
+Cross-tool deduplication and re-ranking of tool results before they reach the LLM.
+
+Tavily, Arxiv, Wikipedia and the local corpus often return the same page or
+paper: a Wikipedia article both as a Wikipedia result and as a Tavily hit,
+an arXiv paper under /abs/ and /pdf/ links or as Arxiv's own summary, the
+same abstract mirrored on another site. After each round of tool calls,
+their items (parsed into title, URL and snippet by token_budget.parse_items)
+are pooled and:
+
+1. keyed by canonical URL (no scheme, www./m. prefix, tracking parameters
+   or fragment; arXiv links reduced to the paper id, Wikipedia titles
+   decoded), or by normalized title when there is no URL;
+2. sketched with a bottom-k MinHash of their word shingles, so the same
+   text under a different URL, or a lightly edited or truncated copy,
+   counts as a near duplicate;
+3. scored against the question and the tool queries with BM25 over the
+   round's items.
+
+Items are then taken best first, skipping exact and near duplicates of
+anything already taken (or forwarded earlier in the turn), until the top N
+unique items are chosen. Items scoring far below the best one are dropped
+even if there is room, as they rarely help the answer.
+
+    python evidence.py "https://arxiv.org/pdf/2101.00001v2#page=3"    # show the canonical URL
+"""
+import heapq
+import math
+import re
+import urllib.parse
+import zlib
+from collections import Counter
+
+from local_index import B, K1, tokenize
+
+SKETCH_SIZE = 64
+SHINGLE_WORDS = 3
+#Texts shorter than this many shingles are too short to call near duplicates
+MIN_SHINGLES = 5
+TRACKING_PARAMS = re.compile(r"^(utm_.*|fbclid|gclid|mc_cid|mc_eid|ref|ref_src|source)$")
+ARXIV_PATH = re.compile(r"^/(?:abs|pdf|html)/(.+?)(?:v\d+)?(?:\.pdf)?$")
+HOST_PREFIX = re.compile(r"^(www|m|mobile)\.")
+
+
+def canonical_url(url):
+    """
+    "https://en.m.wikipedia.org/wiki/Alan%20Turing#Life" -> "en.wikipedia.org/wiki/alan_turing".
+
+    Raises ValueError for URLs that do not parse, such as "http://[broken/page".
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    host = HOST_PREFIX.sub("", (parts.hostname or "").lower()).replace(".m.wikipedia.org", ".wikipedia.org")
+    path = urllib.parse.unquote(parts.path).rstrip("/")
+    if host.endswith("arxiv.org"):
+        m = ARXIV_PATH.match(path)
+        if m:
+            return "arxiv.org/abs/" + m.group(1).lower()
+    if host.endswith("wikipedia.org"):
+        path = path.replace(" ", "_")
+    params = sorted((k, v) for k, v in urllib.parse.parse_qsl(parts.query) if not TRACKING_PARAMS.match(k.lower()))
+    query = urllib.parse.urlencode(params)
+    return f"{host}{path.lower()}" + (f"?{query}" if query else "")
+
+
+def evidence_key(item):
+    """Exact identity of an item: canonical URL, else normalized title, else its text."""
+    if item["url"]:
+        try:
+            return canonical_url(item["url"])
+        except ValueError:
+            pass  # a malformed URL from a tool result identifies nothing; fall back to the title
+    title = " ".join(tokenize(item["title"]))
+    if title:
+        return "title:" + title
+    return "text:" + " ".join(item["snippet"].lower().split())[:200]
+
+
+def sketch(text):
+    """Bottom-k MinHash of the text's word shingles: (number of shingles, k smallest shingle hashes)."""
+    words = tokenize(text)
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    # crc32 is stable across processes (sketches are kept in checkpoints) and ample for a few hundred shingles
+    hashes = {zlib.crc32(s.encode()) for s in shingles}
+    return len(hashes), sorted(heapq.nsmallest(SKETCH_SIZE, hashes))
+
+
+def containment(a, b):
+    """Estimated share of the smaller text's shingles that also occur in the other text."""
+    (size_a, hashes_a), (size_b, hashes_b) = a, b
+    if min(size_a, size_b) < MIN_SHINGLES:
+        return 0.0
+    # The k smallest hashes of the union are a uniform sample of it; the share found in both estimates Jaccard
+    set_a, set_b = set(hashes_a), set(hashes_b)
+    union = heapq.nsmallest(SKETCH_SIZE, set_a | set_b)
+    # A truncated sketch says nothing about hashes above its largest one; a complete one is the whole set
+    max_a = hashes_a[-1] if size_a > SKETCH_SIZE else math.inf
+    max_b = hashes_b[-1] if size_b > SKETCH_SIZE else math.inf
+    union = [h for h in union if h <= max_a and h <= max_b]
+    if not union:
+        return 0.0
+    jaccard = sum(h in set_a and h in set_b for h in union) / len(union)
+    shared = jaccard * (size_a + size_b) / (1 + jaccard)
+    return min(1.0, shared / min(size_a, size_b))
+
+
+def scores(query, items):
+    """BM25 of each item (title counted twice) against the query, with statistics from the items themselves."""
+    terms = set(tokenize(query))
+    docs = [Counter(tokenize(f"{it['title']} {it['title']} {it['snippet']}")) for it in items]
+    if not terms or not docs:
+        return [0.0] * len(items)
+    n = len(docs)
+    avgdl = sum(sum(d.values()) for d in docs) / n or 1
+    df = {t: sum(t in d for d in docs) for t in terms}
+    idf = {t: math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5)) for t in terms}
+    result = []
+    for d in docs:
+        norm = K1 * (1 - B + B * sum(d.values()) / avgdl)
+        result.append(sum(idf[t] * d[t] * (K1 + 1) / (d[t] + norm) for t in terms if d[t]))
+    return result
+
+
+def select(items, query, seen_keys, seen_sketches, top_n, per_group, threshold, min_score=0.0):
+    """
+    Rank items against the query and keep the best unique ones.
+
+    `seen_keys` and `seen_sketches` describe evidence already in the
+    conversation and are extended with what is kept. Items may carry a
+    "group" (the tool result they came from), of which at most `per_group`
+    are kept; items scoring below `min_score` times the best score are
+    dropped. Returns (kept items best first, each with its "key" and
+    "sketch", and counts of what was dropped and why).
+    """
+    counts = {"items": len(items), "duplicates": 0, "near_duplicates": 0, "ranked_out": 0, "forwarded": 0}
+    per = Counter()
+    kept = []
+    ranked = sorted(zip(scores(query, items), range(len(items))), key=lambda s: (-s[0], s[1]))
+    floor = ranked[0][0] * min_score if ranked else 0.0
+    for score, i in ranked:
+        item = items[i]
+        key = evidence_key(item)
+        if key in seen_keys:
+            counts["duplicates"] += 1
+            continue
+        item_sketch = sketch(f"{item['title']} {item['snippet']}")
+        if any(containment(item_sketch, other) >= threshold for other in seen_sketches):
+            counts["near_duplicates"] += 1
+            continue
+        if len(kept) >= top_n or per[item.get("group")] >= per_group or score < floor:
+            counts["ranked_out"] += 1
+            continue
+        seen_keys.add(key)
+        seen_sketches.append(item_sketch)
+        per[item.get("group")] += 1
+        kept.append({**item, "key": key, "score": round(score, 3), "sketch": item_sketch})
+    counts["forwarded"] = len(kept)
+    return kept, counts
+
+
+class EvidenceStats:
+    def __init__(self):
+        self.stats = {"rounds": 0, "items": 0, "duplicates": 0, "near_duplicates": 0, "ranked_out": 0,
+                      "forwarded": 0}
+
+    def add(self, counts):
+        self.stats["rounds"] += 1
+        for k, v in counts.items():
+            self.stats[k] += v
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        items = stats["items"]
+        stats["dedupe_ratio"] = round((stats["duplicates"] + stats["near_duplicates"]) / items, 4) if items else 0.0
+        stats["forward_ratio"] = round(stats["forwarded"] / items, 4) if items else 0.0
+        return stats
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(canonical_url(" ".join(sys.argv[1:])))
@@ -0,0 +1,104 @@
+"""
+Shared, pooled HTTP clients for every outbound call (Groq, Tavily, Arxiv, Wikipedia).
+
+One keep-alive connection pool per process instead of one per wrapper, so
+ReAct steps reuse TLS sessions and DNS results. HTTP/2 is used when the
+optional `h2` package is installed. Connection reuse is tracked by watching
+which network stream served each response.
+"""
+import os
+import threading
+import weakref
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+class ReuseTracker:
+    def __init__(self):
+        self.stats = {"requests": 0, "reused": 0}
+        self._streams = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def observe(self, response):
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            self.stats["requests"] += 1
+            if stream is None:
+                return
+            if stream in self._streams:
+                self.stats["reused"] += 1
+            else:
+                self._streams.add(stream)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["reuse_ratio"] = round(stats["reused"] / stats["requests"], 4) if stats["requests"] else 0.0
+        stats["http2"] = int(HTTP2)
+        return stats
+
+
+tracker = ReuseTracker()
+_clients = {}
+_lock = threading.Lock()
+
+
+def _settings():
+    """Read at first client creation so values from .env are honoured."""
+    env = os.environ.get
+    return {
+        "timeout": httpx.Timeout(float(env("HTTP_TIMEOUT", "30")), connect=float(env("HTTP_CONNECT_TIMEOUT", "5"))),
+        "limits": httpx.Limits(
+            max_connections=int(env("HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(env("HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(env("HTTP_KEEPALIVE_EXPIRY", "60")),
+        ),
+        "http2": HTTP2,
+        # Transport-level retries cover connection failures only; the Groq SDK retries 429/5xx itself
+        "retries": int(env("HTTP_RETRIES", "2")),
+    }
+
+
+def sync_client():
+    """Thread-safe client shared by the tool threads."""
+    with _lock:
+        if "sync" not in _clients:
+            s = _settings()
+            _clients["sync"] = httpx.Client(
+                transport=httpx.HTTPTransport(retries=s["retries"], limits=s["limits"], http2=s["http2"]),
+                timeout=s["timeout"],
+                event_hooks={"response": [tracker.observe]},
+            )
+        return _clients["sync"]
+
+
+def async_client():
+    """Client shared by async callers on the server's event loop (the LLM)."""
+    async def observe(response):
+        tracker.observe(response)
+
+    with _lock:
+        if "async" not in _clients:
+            s = _settings()
+            _clients["async"] = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(retries=s["retries"], limits=s["limits"], http2=s["http2"]),
+                timeout=s["timeout"],
+                event_hooks={"response": [observe]},
+            )
+        return _clients["async"]
+
+
+async def aclose():
+    with _lock:
+        clients = dict(_clients)
+        _clients.clear()
+    for name, client in clients.items():
+        if name == "async":
+            await client.aclose()
+        else:
+            client.close()
@@ -1,32 +1,76 @@
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response,StreamingResponse
+import asyncio
+import functools
 import json
+import logging
 import os
+import threading
+import time
+import uuid
+from collections import defaultdict,deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from langchain_community.tools import ArxivQueryRun,WikipediaQueryRun
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_community.utilities import WikipediaAPIWrapper,ArxivAPIWrapper
-from langchain_groq import ChatGroq
 from typing import TypedDict,Annotated,Optional
 from langgraph.graph.message import  AnyMessage,add_messages
-from IPython.display import Image,display
 from langgraph.graph import StateGraph,START,END
-from langgraph.prebuilt import ToolNode,tools_condition
-from pydantic import BaseModel
+from langgraph.prebuilt import tools_condition
+from pydantic import BaseModel,Field
 from fastapi import FastAPI
-from langchain_core.messages import HumanMessage,ToolMessage
+from langchain_core.messages import AIMessage,AIMessageChunk,HumanMessage,ToolMessage,trim_messages
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from starlette.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, HTTPException, Header
 import secrets
+from tool_cache import ToolCache,cache_key,normalize_args
+from single_flight import SingleFlight
+import metrics
+import http_pool
+from admission import AdmissionController,AdmissionRejected,QueueTimeout
+import token_budget
+import router
+from budget import BudgetPolicy
+from prefetch import PrefetchStats,Speculation
+from model_pool import Backend,ModelPool
+import evidence
 
 load_dotenv()
-
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("nexus")
 
 NEXUS_API_KEY = os.environ.get("NEXUS_API_KEY")
 print(f"\n✓ NEXUS API KEY loaded from .env\n")
 if not NEXUS_API_KEY:
     raise RuntimeError("NEXUS_API_KEY is not set")
 
-app = FastAPI()
+#Concurrency limits: executing graphs are bounded by admission control, not by the threadpool size
+MAX_CONCURRENT_SESSIONS = int(os.environ.get("MAX_CONCURRENT_SESSIONS", "64"))
+TOOL_THREADS = int(os.environ.get("TOOL_THREADS", "16"))
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="tool")
+#Stream answer tokens as answer_delta events; answer_reset means the answer restarts and deltas so far are void
+#(can be overridden per request with "stream_tokens")
+STREAM_TOKENS = os.environ.get("STREAM_TOKENS", "1") == "1"
+
+#Conversation threads are checkpointed here; the prompt sent to the LLM is trimmed to this budget
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", "checkpoints.sqlite3")
+CONTEXT_MAX_TOKENS = int(os.environ.get("CONTEXT_MAX_TOKENS", "6000"))
+
+@asynccontextmanager
+async def lifespan(app):
+    """Attach the SQLite checkpointer to the graph for the lifetime of the server."""
+    global graph
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    async with AsyncSqliteSaver.from_conn_string(CHECKPOINT_PATH) as saver:
+        graph = builder.compile(checkpointer=saver)
+        yield
+    if local_index is not None:
+        local_index.close()
+    await http_pool.aclose()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(CORSMiddleware,allow_origins=["http://localhost:8501"],allow_methods=["*"],allow_headers=["*"])
 
 def verify_api_key(x_api_key: Optional[str] = Header(None)):
@@ -42,48 +86,555 @@ def verify_api_key(x_api_key: Optional[str] = Header(None)):
             detail="Invalid API key."
         )
 
+#Tool clients and the LLM are built on first use so importing this module stays cheap
+#and never touches the network; the graph only needs their names and schemas up front.
+class QueryInput(BaseModel):
+    query: str = Field(description="search query to look up")
+
+#Tools and the LLM share one pooled keep-alive HTTP client layer (see http_pool)
 #Tool for Finding Paper
-api_wrapper_arxiv=ArxivAPIWrapper(top_k_results=2,doc_content_chars_max=500)
-arxiv=ArxivQueryRun(api_wrapper=api_wrapper_arxiv,description="Query arxiv paper")
+@functools.cache
+def get_arxiv():
+    from search_clients import ArxivSearch
+    return ArxivSearch(top_k_results=2,doc_content_chars_max=500)
 
 #Tool for Recent Data search
-api_wrapper_wiki=WikipediaAPIWrapper(top_k_results=2,doc_content_chars_max=500)
-wiki=WikipediaQueryRun(api_wrapper=api_wrapper_wiki)
+@functools.cache
+def get_wiki():
+    from search_clients import WikipediaSearch
+    return WikipediaSearch(top_k_results=2,doc_content_chars_max=500)
 
 #Fetching Tavilyapikey
-api_key=os.environ.get("TAVILY_API_KEY")
-tavily_search=TavilySearchResults(api_key=api_key)
-tools=[arxiv,wiki,tavily_search]
-
-llm = ChatGroq(
-    model="qwen/qwen3-32b",
-    api_key=os.environ.get("GROQ_API_KEY"),
-    temperature=0.7
-)
-llm_with_tools=llm.bind_tools(tools)
+@functools.cache
+def get_tavily():
+    from search_clients import TavilySearch
+    return TavilySearch(api_key=os.environ.get("TAVILY_API_KEY"))
+
+#Local corpus: everything Arxiv and Wikipedia return is added to an on-disk BM25 index
+#(see local_index.py), searchable as a tool that answers repeat topics without a network call
+LOCAL_INDEX = os.environ.get("LOCAL_INDEX", "1") == "1"
+INDEXED_TOOLS = ("arxiv", "wikipedia")
+
+local_index = None
+local_index_lock = threading.Lock()
+
+def get_local_index():
+    # Built under a lock: tool threads racing on first use would otherwise open the directory twice
+    global local_index
+    with local_index_lock:
+        if local_index is None:
+            from local_index import LocalIndex
+            local_index = LocalIndex(
+                path=os.environ.get("LOCAL_INDEX_PATH", "local_index"),
+                flush_docs=int(os.environ.get("LOCAL_INDEX_FLUSH_DOCS", "64")),
+            )
+    return local_index
+
+@functools.cache
+def get_local_corpus():
+    from local_index import LocalCorpusSearch
+    return LocalCorpusSearch(get_local_index(), top_k_results=int(os.environ.get("LOCAL_INDEX_TOP_K", "3")))
+
+TOOL_SPECS = {
+    "arxiv": ("Query arxiv paper", get_arxiv),
+    "wikipedia": (
+        "A wrapper around Wikipedia. Useful for when you need to answer general questions about "
+        "people, places, companies, facts, historical events, or other subjects. "
+        "Input should be a search query.",
+        get_wiki,
+    ),
+    "tavily_search_results_json": (
+        "A search engine optimized for comprehensive, accurate, and trusted results. "
+        "Useful for when you need to answer questions about current events. "
+        "Input should be a search query.",
+        get_tavily,
+    ),
+}
+if LOCAL_INDEX:
+    TOOL_SPECS["local_corpus"] = (
+        "Search the arXiv papers and Wikipedia pages fetched in earlier research. Covers only topics "
+        "researched before, not new or current material. Input should be a search query.",
+        get_local_corpus,
+    )
+
+#Tool result cache: in-memory LRU in front of SQLite, TTL per tool (short for live web search).
+#Opened on first use, like the local index, so importing this module writes nothing to disk.
+tool_cache = None
+tool_cache_lock = threading.Lock()
+
+def get_tool_cache():
+    global tool_cache
+    with tool_cache_lock:
+        if tool_cache is None:
+            tool_cache = ToolCache(
+                path=os.environ.get("TOOL_CACHE_PATH", "tool_cache.sqlite3"),
+                max_memory_entries=int(os.environ.get("TOOL_CACHE_MEMORY_ENTRIES", "1024")),
+                purge_every=int(os.environ.get("TOOL_CACHE_PURGE_EVERY", "500")),
+                ttls={
+                    "arxiv": int(os.environ.get("TOOL_CACHE_TTL_ARXIV", str(7 * 24 * 3600))),
+                    "wikipedia": int(os.environ.get("TOOL_CACHE_TTL_WIKI", str(24 * 3600))),
+                    "tavily_search_results_json": int(os.environ.get("TOOL_CACHE_TTL_TAVILY", "900")),
+                    #The local index changes as documents arrive and is faster than the cache; never cache it
+                    "local_corpus": 0,
+                },
+            )
+    return tool_cache
+
+def tool_cache_snapshot():
+    """Tool cache counters; empty until the first tool call opens the cache."""
+    return tool_cache.snapshot() if tool_cache is not None else {}
+
+#Replacement backends, e.g. deterministic local fakes for offline benchmarks (see use_backends)
+backend_overrides = {"llm": None, "tools": {}}
+
+def tool_impl(name):
+    return backend_overrides["tools"].get(name) or TOOL_SPECS[name][1]()
+
+def fetch(name, kwargs):
+    """Call the real tool, adding any documents it returned to the local index."""
+    impl = tool_impl(name)
+    if not LOCAL_INDEX or name not in INDEXED_TOOLS:
+        return impl.invoke(kwargs)
+    if hasattr(impl, "search"):
+        # Index the full documents, not the wrapper's truncated text
+        docs = impl.search(kwargs)
+        value = impl.format(docs)
+    else:
+        value = impl.invoke(kwargs)
+        docs = [{**it, "content": it["snippet"]} for it in token_budget.parse_items(name, value) if it["title"]]
+    try:
+        get_local_index().add([{"title": d["title"], "url": d.get("url", ""), "text": d.get("content", ""),
+                                "source": name} for d in docs])
+    except Exception:
+        logger.exception("could not index %s results", name)
+    return value
+
+def cached_invoke(name, key, kwargs):
+    """Serve a tool call from the cache, falling back to the real tool and storing its result."""
+    cache = get_tool_cache()
+    if cache.ttl_for(name) <= 0:
+        return fetch(name, kwargs)
+    hit, value = cache.get(key)
+    if hit:
+        return value
+    value = fetch(name, kwargs)
+    cache.set(key, name, value)
+    return value
+
+#Identical tool calls already running (e.g. from different queries of one batch) are awaited, not repeated
+inflight_tool_calls = {}
+
+def make_async_tool(name, description):
+    """Wrap a lazily built sync tool so its blocking call runs on the tool pool and only for the call's duration."""
+    async def _arun(**kwargs):
+        key = cache_key(name, kwargs)
+        hit, value = get_tool_cache().get_memory(key)
+        if hit:
+            return value
+        pending = inflight_tool_calls.get(key)
+        if pending is not None:
+            tool_stats["deduped"] += 1
+            return await asyncio.shield(pending)
+        loop = asyncio.get_running_loop()
+        pending = loop.run_in_executor(tool_executor, functools.partial(cached_invoke, name, key, kwargs))
+        inflight_tool_calls[key] = pending
+        pending.add_done_callback(lambda _: inflight_tool_calls.pop(key, None))
+        return await asyncio.shield(pending)
+    return StructuredTool.from_function(
+        func=lambda **kwargs: cached_invoke(name, cache_key(name, kwargs), kwargs),
+        coroutine=_arun,
+        name=name,
+        description=description,
+        args_schema=QueryInput,
+    )
+
+tools=[make_async_tool(name, description) for name, (description, _) in TOOL_SPECS.items()]
+tools_by_name = {t.name: t for t in tools}
+
+#LLM backends: an ordered pool routed by observed latency and errors, with failover (see model_pool.py).
+#LLM_BACKENDS is a JSON list; the default is the single Groq model. For example:
+#[{"name": "groq", "model": "qwen/qwen3-32b"},
+# {"name": "local", "provider": "openai", "model": "qwen3-32b", "base_url": "http://127.0.0.1:8080/v1"}]
+DEFAULT_LLM_BACKENDS = [{"name": "groq", "provider": "groq", "model": "qwen/qwen3-32b"}]
+LLM_FIRST_TOKEN_TIMEOUT = float(os.environ.get("LLM_FIRST_TOKEN_TIMEOUT", "20"))
+LLM_STALL_TIMEOUT = float(os.environ.get("LLM_STALL_TIMEOUT", "10"))
+
+def build_chat_model(spec, max_retries):
+    """Chat model for one LLM_BACKENDS entry; "openai" covers any OpenAI-compatible server."""
+    provider = spec.get("provider", "groq")
+    common = {
+        "model": spec["model"],
+        "temperature": float(spec.get("temperature", 0.7)),
+        "max_retries": max_retries,
+        "http_client": http_pool.sync_client(),
+        "http_async_client": http_pool.async_client(),
+    }
+    if provider == "groq":
+        from langchain_groq import ChatGroq
+        return ChatGroq(api_key=os.environ.get(spec.get("api_key_env", "GROQ_API_KEY")),
+                        base_url=spec.get("base_url") or os.environ.get("GROQ_BASE_URL"), **common)
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+        # Local servers usually ignore the key, but the client insists on one
+        return ChatOpenAI(api_key=os.environ.get(spec.get("api_key_env", "OPENAI_API_KEY")) or "not-needed",
+                          base_url=spec.get("base_url"), **common)
+    raise ValueError(f"Unknown LLM provider {provider!r} in LLM_BACKENDS")
+
+@functools.cache
+def get_llm():
+    llm = backend_overrides["llm"]
+    if llm is None:
+        specs = json.loads(os.environ.get("LLM_BACKENDS") or "null") or DEFAULT_LLM_BACKENDS
+        # With somewhere to fail over to, move on at once instead of retrying inside the SDK
+        retries = int(os.environ.get("GROQ_MAX_RETRIES", "2")) if len(specs) == 1 else 0
+        llm = ModelPool(
+            [Backend(spec.get("name", spec["model"]),
+                     functools.partial(build_chat_model, spec, int(spec.get("max_retries", retries))),
+                     first_token_timeout_s=float(spec.get("first_token_timeout_s", LLM_FIRST_TOKEN_TIMEOUT)),
+                     stall_timeout_s=float(spec.get("stall_timeout_s", LLM_STALL_TIMEOUT)))
+             for spec in specs],
+            cooldown_s=float(os.environ.get("LLM_COOLDOWN", "15")),
+            explore_every=int(os.environ.get("LLM_EXPLORE_EVERY", "20")),
+        )
+    return llm
+
+def llm_pool_snapshot():
+    """Per-backend routing counters, once the pool has been built."""
+    if not get_llm.cache_info().currsize or not isinstance(get_llm(), ModelPool):
+        return {}
+    return get_llm().snapshot()
+
+@functools.cache
+def get_llm_with_tools(names=None):
+    """The LLM with all tools bound, or only the named subset (one cached binding per subset)."""
+    bound = tools if names is None else [t for t in tools if t.name in names]
+    return get_llm().bind_tools(bound)
+
+def use_backends(llm=None, tool_impls=None):
+    """Replace the LLM pool and/or tool implementations (objects with .invoke(dict)) for this process."""
+    backend_overrides["llm"] = llm
+    backend_overrides["tools"] = dict(tool_impls or {})
+    get_llm.cache_clear()
+    get_llm_with_tools.cache_clear()
 
 #Creating State
 class State(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]
+    route: dict
+
+def current_turn(messages):
+    last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+    return messages[last_human:]
+
+def bounded_context(messages):
+    """Keep the most recent whole turns that fit CONTEXT_MAX_TOKENS; the current turn is always kept."""
+    trimmed = trim_messages(
+        messages,
+        max_tokens=CONTEXT_MAX_TOKENS,
+        strategy="last",
+        token_counter=count_tokens_approximately,
+        start_on="human",
+        include_system=True,
+    )
+    turn = current_turn(messages)
+    if len(trimmed) < len(turn):
+        return turn
+    return trimmed
+
+#Routing: a keyword router (see router.py) runs before the first LLM call of each turn. Trivial
+#queries get a tool-free LLM call; the rest bind only the tools that look relevant.
+QUERY_ROUTER = os.environ.get("QUERY_ROUTER", "1") == "1"
+tool_schema_tokens = {t.name: token_budget.approx_tokens(json.dumps(convert_to_openai_tool(t))) for t in tools}
+route_stats = {"direct": 0, "subset": 0, "all": 0, "llm_calls_without_tools": 0, "tool_schema_tokens_saved": 0}
+
+@metrics.timed_node("router")
+async def route_query(state:State):
+    turn = current_turn(state["messages"])
+    if QUERY_ROUTER and turn and isinstance(turn[0], HumanMessage):
+        route = router.route(str(turn[0].content))
+    else:
+        route = {"kind": "all", "tools": list(tool_schema_tokens), "reason": "router disabled"}
+    route_stats[route["kind"]] += 1
+    metrics.routes.labels(route["kind"]).inc()
+    return {"route": route}
+
+def routed_llm(route):
+    """LLM binding for a route; records the tool-schema prompt tokens the route avoided."""
+    names = tuple(route["tools"]) if route else tuple(tool_schema_tokens)
+    if names and "local_corpus" in tools_by_name and "local_corpus" not in names:
+        # The local corpus costs no upstream call, so it rides along with any routed subset
+        names += ("local_corpus",)
+    saved = sum(tool_schema_tokens.values()) - sum(tool_schema_tokens.get(n, 0) for n in names)
+    route_stats["tool_schema_tokens_saved"] += saved
+    if not names:
+        route_stats["llm_calls_without_tools"] += 1
+        return get_llm()
+    return get_llm_with_tools(None if len(names) == len(tools) else names)
+
+#Budgets: each request carries a deadline and a cap on LLM steps (see budget.py). The last
+#allowed step, or any step once only the answer reserve is left, answers without tools.
+budget_policy = BudgetPolicy.from_env()
+FORCED_ANSWER_PROMPT = (
+    "The research budget for this question is used up. Do not call any tools. Answer now using only "
+    "the information gathered above, and briefly note anything you could not verify."
+)
+FALLBACK_ANSWER = "I could not finish researching this within the allowed budget. Please try a narrower question."
+
+async def forced_answer(messages, budget, reason):
+    """Answer without tools once the budget is spent; never returns tool calls."""
+    metrics.forced_answers.labels(reason).inc()
+    try:
+        response = await asyncio.wait_for(
+            get_llm().ainvoke(messages + [HumanMessage(content=FORCED_ANSWER_PROMPT)]),
+            max(budget.remaining(), 1.0),
+        )
+    except asyncio.TimeoutError:
+        response = AIMessage(content=FALLBACK_ANSWER)
+    if response.tool_calls or not response.content:
+        response = AIMessage(content=response.content or FALLBACK_ANSWER,
+                             usage_metadata=getattr(response, "usage_metadata", None))
+    response.response_metadata["forced_answer"] = reason
+    return response
+
+@metrics.timed_node("Tool_calling_llm")
+async def tool_calling_llm(state:State, config:RunnableConfig):
+    messages = bounded_context(state["messages"])
+    budget = config["configurable"].get("budget")
+    reason = None
+    if budget is not None:
+        reason = budget.exhausted(sum(isinstance(m, AIMessage) for m in current_turn(state["messages"])))
+    if reason:
+        response = await forced_answer(messages, budget, reason)
+    elif budget is None:
+        response = await routed_llm(state.get("route")).ainvoke(messages)
+    else:
+        try:
+            response = await asyncio.wait_for(routed_llm(state.get("route")).ainvoke(messages), budget.research_time())
+        except asyncio.TimeoutError:
+            # Tokens already streamed from the cut-off call are voided by run_graph's answer_reset
+            response = await forced_answer(messages, budget, "deadline")
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        metrics.llm_tokens.labels("prompt").inc(usage.get("input_tokens", 0))
+        metrics.llm_tokens.labels("completion").inc(usage.get("output_tokens", 0))
+    return {"messages":[response]}
+
+#Tool execution: independent calls run concurrently, each under its own deadline.
+#A call still running after its tool's observed p95 gets a duplicate (hedged) request.
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "20"))
+TOOL_TIMEOUTS = {
+    "arxiv": float(os.environ.get("TOOL_TIMEOUT_ARXIV", TOOL_TIMEOUT)),
+    "wikipedia": float(os.environ.get("TOOL_TIMEOUT_WIKI", TOOL_TIMEOUT)),
+    "tavily_search_results_json": float(os.environ.get("TOOL_TIMEOUT_TAVILY", TOOL_TIMEOUT)),
+}
+HEDGE_TOOLS = os.environ.get("HEDGE_TOOLS", "1") == "1"
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.2
+tool_latency = defaultdict(lambda: deque(maxlen=200))
+tool_stats = {"calls": 0, "errors": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0, "deduped": 0}
+
+def hedge_delay(name):
+    """p95 of recent latencies for a tool, or None until enough samples exist."""
+    samples = tool_latency[name]
+    if not HEDGE_TOOLS or len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return max(HEDGE_MIN_DELAY, ordered[int(0.95 * (len(ordered) - 1))])
+
+async def hedged_call(tool, args):
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(tool.ainvoke(args))]
+    try:
+        delay = hedge_delay(tool.name)
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tool_stats["hedges"] += 1
+                # The duplicate must bypass in-flight dedupe, or it would just await the slow call
+                hedge = functools.partial(cached_invoke, tool.name, cache_key(tool.name, args), args)
+                tasks.append(asyncio.get_running_loop().run_in_executor(tool_executor, hedge))
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((t for t in done if t.exception() is None), None)
+            if winner is not None:
+                if winner is not tasks[0]:
+                    tool_stats["hedge_wins"] += 1
+                tool_latency[tool.name].append(time.perf_counter() - start)
+                return winner.result()
+        raise tasks[0].exception()
+    finally:
+        for t in tasks:
+            t.cancel()
+
+#Speculative prefetch: likely first tool calls, derived from the query, start alongside the first
+#LLM call (see prefetch.py). Off by default; PREFETCH_TOOLS lists the tools that may be prefetched.
+SPECULATIVE_PREFETCH = os.environ.get("SPECULATIVE_PREFETCH", "0") == "1"
+PREFETCH_TOOLS = tuple(t for t in os.environ.get("PREFETCH_TOOLS", "wikipedia,arxiv").split(",") if t)
+prefetch_stats = PrefetchStats()
+
+def start_speculation(query, budget):
+    """Prefetch the tools the router would bind for this query, limited to PREFETCH_TOOLS."""
+    route = router.route(query) if QUERY_ROUTER else {"kind": "all", "tools": list(router.ALL_TOOLS)}
+    names = [n for n in route["tools"] if n in PREFETCH_TOOLS and n in tools_by_name]
+    if not names:
+        return None
+
+    async def run(name, args):
+        timeout = min(TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT), budget.research_time())
+        return await asyncio.wait_for(tools_by_name[name].ainvoke(args), timeout)
+
+    speculation = Speculation(prefetch_stats)
+    speculation.start([(name, query) for name in names], run)
+    return speculation
+
+async def invoke_tool(tool, args, speculation=None):
+    """Serve a call from a matching prefetch when one succeeds, otherwise call the tool (hedged)."""
+    pending = speculation.claim(tool.name, args) if speculation is not None else None
+    if pending is not None:
+        try:
+            # Shielded: a timeout on this call must not cancel a prefetch other calls may share
+            return await asyncio.shield(pending)
+        except Exception:
+            logger.info("prefetch for %s failed, calling it again", tool.name)
+    return await hedged_call(tool, args)
+
+async def run_tool_call(call, budget=None, speculation=None):
+    name = call["name"]
+    tool_stats["calls"] += 1
+    tool = tools_by_name.get(name)
+    if tool is None:
+        tool_stats["errors"] += 1
+        return ToolMessage(content=f"Error: {name} is not a valid tool, try one of {list(tools_by_name)}.",
+                           name=name, tool_call_id=call["id"], status="error")
+    timeout = TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT)
+    if budget is not None:
+        # Never let a tool eat into the time reserved for the answer
+        timeout = min(timeout, budget.research_time())
+    start = time.perf_counter()
+    try:
+        content = await asyncio.wait_for(invoke_tool(tool, call["args"], speculation), timeout)
+    except asyncio.TimeoutError:
+        metrics.tool_latency.labels(name, "timeout").observe(time.perf_counter() - start)
+        tool_stats["timeouts"] += 1
+        logger.warning("tool %s timed out after %.1fs", name, timeout)
+        content = json.dumps({"error": "tool timed out", "tool": name, "timeout_s": timeout,
+                              "hint": "Continue with the information you already have or try another tool."})
+        return ToolMessage(content=content, name=name, tool_call_id=call["id"], status="error")
+    except Exception as e:
+        metrics.tool_latency.labels(name, "error").observe(time.perf_counter() - start)
+        tool_stats["errors"] += 1
+        return ToolMessage(content=f"Error: {e!r}\n Please fix your mistakes.",
+                           name=name, tool_call_id=call["id"], status="error")
+    metrics.tool_latency.labels(name, "ok").observe(time.perf_counter() - start)
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    return ToolMessage(content=content, name=name, tool_call_id=call["id"])
 
-def tool_calling_llm(state:State):
-    return {"messages":[llm_with_tools.invoke(state["messages"])]}
+#Token budget for tool output within one turn: results are deduped against earlier calls in
+#the turn, cut to the top-k items and truncated so they share what is left of the budget.
+TOOL_TOKEN_BUDGET = int(os.environ.get("TOOL_TOKEN_BUDGET", "2500"))
+TOOL_MIN_TOKENS_PER_CALL = int(os.environ.get("TOOL_MIN_TOKENS_PER_CALL", "150"))
+TOOL_TOP_K = int(os.environ.get("TOOL_TOP_K", "3"))
+
+#Cross-tool evidence selection (see evidence.py): the items of all results in a round are deduped by
+#canonical URL and MinHash, ranked against the question and the tool queries, and only the top N go on;
+#items scoring under EVIDENCE_MIN_SCORE times the best one are dropped.
+#EVIDENCE_RERANK=0 compacts each result on its own, with exact URL/title dedupe only.
+EVIDENCE_RERANK = os.environ.get("EVIDENCE_RERANK", "1") == "1"
+EVIDENCE_TOP_N = int(os.environ.get("EVIDENCE_TOP_N", "6"))
+EVIDENCE_NEAR_DUPLICATE = float(os.environ.get("EVIDENCE_NEAR_DUPLICATE", "0.6"))
+EVIDENCE_MIN_SCORE = float(os.environ.get("EVIDENCE_MIN_SCORE", "0.3"))
+evidence_stats = evidence.EvidenceStats()
+
+#Sources streamed to the client: already deduplicated per turn by the compaction above
+SOURCE_SNIPPET_CHARS = int(os.environ.get("SOURCE_SNIPPET_CHARS", "200"))
+
+def tool_sources(tool_name, items):
+    return [
+        {"title": it["title"], "url": it["url"], "tool": tool_name,
+         "snippet": token_budget.truncate(it["snippet"], SOURCE_SNIPPET_CHARS)}
+        for it in items if it["title"] or it["url"]
+    ]
+
+def apply_token_budget(messages, results):
+    """Compact successful tool results in place against the turn's remaining token budget."""
+    turn = current_turn(messages)
+    earlier = [m for m in turn if isinstance(m, ToolMessage)]
+    used = sum(token_budget.approx_tokens(str(m.content)) for m in earlier)
+    ok = [r for r in results if r.status != "error"]
+    if not ok:
+        return
+    if EVIDENCE_RERANK:
+        select_evidence(turn, messages[-1], ok, TOOL_TOKEN_BUDGET - used)
+        return
+    seen = {k for m in earlier for k in m.response_metadata.get("evidence_keys", [])}
+    share = max(TOOL_MIN_TOKENS_PER_CALL, (TOOL_TOKEN_BUDGET - used) // len(ok))
+    for r in ok:
+        text, items, raw_tokens = token_budget.compact(r.name, r.content, seen, share, top_k=TOOL_TOP_K)
+        r.content = text
+        r.response_metadata = {"evidence_keys": [token_budget.item_key(it) for it in items],
+                               "raw_tokens": raw_tokens, "tokens": token_budget.approx_tokens(text),
+                               "sources": tool_sources(r.name, items)}
+
+def select_evidence(turn, ai_message, results, remaining):
+    """Forward only the best unique items across this round's results, each result keeping its own share."""
+    earlier = [m for m in turn if isinstance(m, ToolMessage)]
+    seen_keys = {k for m in earlier for k in m.response_metadata.get("evidence_keys", [])}
+    seen_sketches = [s for m in earlier for s in m.response_metadata.get("evidence_sketches", [])]
+    question = turn[0].content if turn and isinstance(turn[0], HumanMessage) else ""
+    queries = [str(c["args"].get("query", "")) for c in getattr(ai_message, "tool_calls", [])]
+    items = [{**it, "group": i} for i, r in enumerate(results) for it in token_budget.parse_items(r.name, r.content)]
+    kept, counts = evidence.select(items, " ".join([str(question), *queries]), seen_keys, seen_sketches,
+                                   EVIDENCE_TOP_N, TOOL_TOP_K, EVIDENCE_NEAR_DUPLICATE, EVIDENCE_MIN_SCORE)
+    evidence_stats.add(counts)
+    logger.info("evidence: %d items from %d results, %d duplicates, %d near-duplicates, %d ranked out, %d forwarded",
+                counts["items"], len(results), counts["duplicates"], counts["near_duplicates"],
+                counts["ranked_out"], counts["forwarded"])
+    per_item = max(TOOL_MIN_TOKENS_PER_CALL // 2, remaining // max(1, len(kept)))
+    for i, r in enumerate(results):
+        raw = r.content
+        mine = [it for it in kept if it["group"] == i]
+        if mine:
+            text = token_budget.fit(mine, raw, per_item * len(mine))
+        else:
+            text = "No new results (duplicates of other results in this turn, or ranked below them)."
+        r.content = text
+        r.response_metadata = {"evidence_keys": [it["key"] for it in mine],
+                               "evidence_sketches": [it["sketch"] for it in mine],
+                               "raw_tokens": token_budget.approx_tokens(raw), "tokens": token_budget.approx_tokens(text),
+                               "sources": tool_sources(r.name, mine)}
+
+@metrics.timed_node("tools")
+async def tool_node(state:State, config:RunnableConfig):
+    """Replaces ToolNode(tools): runs every tool call of the last AI message concurrently."""
+    calls = state["messages"][-1].tool_calls
+    budget = config["configurable"].get("budget")
+    speculation = config["configurable"].get("speculation")
+    results = list(await asyncio.gather(*(run_tool_call(c, budget, speculation) for c in calls)))
+    apply_token_budget(state["messages"], results)
+    return {"messages": results}
 
 #Building graph and adding nodes
 builder=StateGraph(State)
+builder.add_node("router",route_query)
 builder.add_node("Tool_calling_llm",tool_calling_llm)
-builder.add_node("tools",ToolNode(tools))
+builder.add_node("tools",tool_node)
 
 #Building edges between nodes
-builder.add_edge(START,"Tool_calling_llm")
+builder.add_edge(START,"router")
+builder.add_edge("router","Tool_calling_llm")
 builder.add_conditional_edges("Tool_calling_llm",tools_condition)
 builder.add_edge("tools","Tool_calling_llm")
 graph=builder.compile()
 
-#Viewing graph
-png_data = graph.get_graph().draw_mermaid_png()
-with open("graph.png", "wb") as f:
-    f.write(png_data)
+#Viewing graph: rendered on demand and cached, never at import time
+@functools.lru_cache(maxsize=2)
+def render_graph(fmt="png"):
+    """Mermaid PNG needs a round-trip to the mermaid.ink renderer; the mermaid source does not."""
+    if fmt == "mermaid":
+        return graph.get_graph().draw_mermaid()
+    return graph.get_graph().draw_mermaid_png()
 
 class QueryRequest(BaseModel):
     query: str
@@ -93,6 +644,31 @@ def health():
     """Public endpoint — no auth needed. Frontend pings this to check if server is up."""
     return {"status": "online"}
 
+@app.get("/graph")
+def graph_view(fmt: str = "png"):
+    """Graph diagram as PNG, or ?fmt=mermaid for the mermaid source (works offline)."""
+    if fmt == "mermaid":
+        return Response(render_graph("mermaid"), media_type="text/plain")
+    try:
+        return Response(render_graph("png"), media_type="image/png")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Graph renderer unavailable: {e}")
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint — node/tool latency histograms, token counts, in-flight gauge."""
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
+@app.get("/stats")
+def stats(x_api_key: Optional[str] = Header(None)):
+    """Tool cache, tool execution, query coalescing, admission, HTTP pool, routing, local index, prefetch, LLM pool and evidence counters."""
+    verify_api_key(x_api_key)
+    return {"cache": tool_cache_snapshot(), "tools": dict(tool_stats), "coalescing": single_flight.snapshot(),
+            "admission": admission.snapshot(), "http": http_pool.tracker.snapshot(), "routing": dict(route_stats),
+            "local_index": local_index_snapshot(), "prefetch": prefetch_stats.snapshot(), "llm": llm_pool_snapshot(),
+            "evidence": evidence_stats.snapshot()}
+
 @app.post("/verify-key")
 def verify_key(x_api_key: Optional[str] = Header(None)):
     """
@@ -102,35 +678,374 @@ def verify_key(x_api_key: Optional[str] = Header(None)):
     verify_api_key(x_api_key)
     return {"valid": True}
 
-@app.post("/ask_stream")
-def ask_stream(req: dict,x_api_key: Optional[str] = Header(None)):
-    verify_api_key(x_api_key)
-    def event_generator():
+def node_update_events(node, value):
+    """Translate one graph node update into client events."""
+    if node == "router":
+        return [{"type": "route", "data": {"kind": value["route"]["kind"], "tools": value["route"]["tools"]}}]
+    if node == "tools":
+        # Tool output stays server-side; the client only gets the sources it cited
+        return [{"type": "source", "data": s}
+                for m in value.get("messages", []) for s in m.response_metadata.get("sources", [])]
+
+    msg = value.get("messages", [])[-1]
 
-        for event in graph.stream({
-            "messages": [HumanMessage(content=req["query"])]
-        }):
+    # tool call
+    if hasattr(msg, "tool_calls") and msg.tool_calls:
+        return [{"type": "tool", "data": msg.tool_calls}]
 
-            # event contains node updates
-            for node, value in event.items():
+    # final AI output
+    if hasattr(msg, "content"):
+        return [{"type": "answer", "data": msg.content}]
+    return []
+
+def answer_delta(chunk, metadata):
+    """Return the answer text carried by an LLM message chunk, or None for tool-call/other chunks."""
+    if metadata.get("langgraph_node") != "Tool_calling_llm" or not isinstance(chunk, AIMessageChunk):
+        return None
+    if chunk.tool_call_chunks or not isinstance(chunk.content, str) or not chunk.content:
+        return None
+    return chunk.content
+
+#Admission control: per-key token buckets, a cap on executing graphs and a bounded FIFO wait queue
+admission = AdmissionController(
+    max_running=MAX_CONCURRENT_SESSIONS,
+    max_queue=int(os.environ.get("ADMISSION_QUEUE_SIZE", "128")),
+    queue_timeout=float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "60")),
+    rate_per_minute=float(os.environ.get("RATE_LIMIT_PER_MINUTE", "30")),
+    burst=int(os.environ.get("RATE_LIMIT_BURST", "10")),
+)
+
+def admit_or_429(check, *args):
+    """Run an admission check, turning a rejection into 429 with Retry-After."""
+    try:
+        return check(*args)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+def request_budget(req, api_key):
+    """Budget from the key's limits and the request's optional deadline_s / max_steps."""
+    try:
+        return budget_policy.for_request(api_key, req.get("deadline_s"), req.get("max_steps"))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid budget: {e}")
+
+def request_flag(req, name, default):
+    """A per-request on/off override; only JSON booleans, since "false" would otherwise read as true."""
+    value = req.get(name, default)
+    if not isinstance(value, bool):
+        raise HTTPException(status_code=400, detail=f"{name} must be true or false.")
+    return value
+
+async def run_graph(query, thread_id, stream_tokens, ticket, budget, speculative=False):
+    """Run one research request through the graph once admitted, yielding client events as dicts."""
+    modes = ["updates", "messages"] if stream_tokens else ["updates"]
+    # recursion_limit is only a backstop; the step budget ends the loop first
+    config = {"configurable": {"thread_id": thread_id, "budget": budget}, "recursion_limit": 2 * budget.max_steps + 4}
+    start = time.perf_counter()
+    ttfb = ttft = None
+    prompt_tokens = []
+    tokens_saved = 0
+    iterations = 0
+    forced = None
+    route = None
+    prefetch = None
+    streaming_id = None
+    try:
+        yield {"type": "thread", "data": thread_id}
+        async for position in ticket.wait():
+            yield {"type": "queue", "data": {"position": position}}
+        # The deadline covers graph execution; queue waiting has its own timeout
+        budget.start()
+        speculation = start_speculation(query, budget) if speculative else None
+        config["configurable"]["speculation"] = speculation
+        metrics.in_flight.inc()
+        try:
+            async for mode, chunk in graph.astream({
+                "messages": [HumanMessage(content=query)]
+            }, config=config, stream_mode=modes):
+
+                if mode == "messages":
+                    delta = answer_delta(*chunk)
+                    if delta is None:
+                        continue
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                        metrics.time_to_first_token.observe(ttft)
+                    events = [{"type": "answer_delta", "data": delta}]
+                    if streaming_id is not None and chunk[0].id != streaming_id:
+                        # Text from another LLM call (the next step, a failover backend or the forced
+                        # answer after a deadline cut) starts over: clients drop what was streamed
+                        events.insert(0, {"type": "answer_reset"})
+                    streaming_id = chunk[0].id
+                else:
+                    # chunk contains node updates
+                    events = [e for node, value in chunk.items() for e in node_update_events(node, value)]
+                    if "router" in chunk:
+                        route = chunk["router"]["route"]["kind"]
+                    if "Tool_calling_llm" in chunk:
+                        iterations += 1
+                        forced = chunk["Tool_calling_llm"]["messages"][-1].response_metadata.get("forced_answer", forced)
+                        usage = getattr(chunk["Tool_calling_llm"]["messages"][-1], "usage_metadata", None)
+                        if usage:
+                            prompt_tokens.append(usage.get("input_tokens", 0))
+                    for m in chunk.get("tools", {}).get("messages", []):
+                        meta = m.response_metadata
+                        tokens_saved += meta.get("raw_tokens", 0) - meta.get("tokens", meta.get("raw_tokens", 0))
+
+                for e in events:
+                    if ttfb is None and e["type"] != "route":
+                        ttfb = time.perf_counter() - start
+                        metrics.time_to_first_event.observe(ttfb)
+                    yield e
+        finally:
+            if speculation is not None:
+                prefetch = speculation.finish()
+            metrics.in_flight.dec()
+            metrics.react_iterations.observe(iterations)
+            metrics.stream_duration.observe(time.perf_counter() - start)
+    except QueueTimeout as e:
+        yield {"type": "error", "data": str(e)}
+        return
+    finally:
+        ticket.release()
+
+    stats = {
+        "thread_id": thread_id,
+        "ttfb_ms": round(ttfb * 1000, 1) if ttfb is not None else None,
+        "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+        "total_ms": round((time.perf_counter() - start) * 1000, 1),
+        "iterations": iterations,
+        "prompt_tokens": prompt_tokens,
+        "tool_tokens_saved": tokens_saved,
+        "budget": budget.limits(),
+        "forced_answer": forced,
+        "route": route,
+        "prefetch": prefetch,
+    }
+    logger.info("ask_stream thread=%s ttfb=%sms ttft=%sms total=%sms iterations=%s prompt_tokens=%s tool_tokens_saved=%s forced=%s prefetch=%s",
+                thread_id, stats["ttfb_ms"], stats["ttft_ms"], stats["total_ms"], iterations, prompt_tokens, tokens_saved, forced, prefetch)
+    yield {"type": "stats", "data": stats}
+
+#Single-flight: identical new-conversation queries in flight at the same time share one graph run.
+#Finished runs stay joinable for COALESCE_REPLAY_TTL seconds from their replay buffer.
+#Every run streams from such a buffer, so a dropped client can resume it (see ask_stream) until
+#STREAM_RESUME_TTL seconds after it finished, as long as its last event has not been evicted.
+COALESCE_QUERIES = os.environ.get("COALESCE_QUERIES", "1") == "1"
+single_flight = SingleFlight(
+    replay_ttl=float(os.environ.get("COALESCE_REPLAY_TTL", "10")),
+    max_events=int(os.environ.get("COALESCE_MAX_EVENTS", "5000")),
+    resume_ttl=float(os.environ.get("STREAM_RESUME_TTL", "60")),
+)
+#Server-sent events: a comment line every SSE_HEARTBEAT idle seconds keeps proxies from timing out
+SSE_HEARTBEAT = float(os.environ.get("SSE_HEARTBEAT", "15"))
+SSE_RETRY_MS = int(os.environ.get("SSE_RETRY_MS", "2000"))
 
-                msg = value.get("messages", [])[-1]
+metrics.register_stats("cache", tool_cache_snapshot)
+metrics.register_stats("tools", lambda: tool_stats)
+metrics.register_stats("coalescing", single_flight.snapshot)
+metrics.register_stats("admission", admission.snapshot)
+metrics.register_stats("http", http_pool.tracker.snapshot)
+metrics.register_stats("routing", lambda: route_stats)
 
-                # tool call
-                if hasattr(msg, "tool_calls") and msg.tool_calls:
-                    yield json.dumps({
-                        "type": "tool",
-                        "data": msg.tool_calls
-                    }) + "\n"
+def local_index_snapshot():
+    """Counters of the local index, without opening it just to report on it."""
+    return local_index.snapshot() if local_index is not None else {}
 
-                # final AI output
-                elif hasattr(msg, "content"):
-                    yield json.dumps({
-                        "type": "answer",
-                        "data": msg.content
-                    }) + "\n"
+metrics.register_stats("local_index", local_index_snapshot)
+metrics.register_stats("prefetch", prefetch_stats.snapshot)
+metrics.register_stats("evidence", evidence_stats.snapshot)
+metrics.register_stats("llm", llm_pool_snapshot)
+
+def join_shared_run(query, stream_tokens, budget, speculative=False):
+    """Join the in-flight run for this query, or admit and start one. Returns (flight, is_leader)."""
+    key = (normalize_args(query), stream_tokens, tuple(budget.limits().values()))
+    def start():
+        ticket = admit_or_429(admission.admit)
+        shared_thread = uuid.uuid4().hex
+        events = run_graph(query, shared_thread, stream_tokens, ticket, budget, speculative)
+        return events, {"thread_id": shared_thread}
+    return single_flight.join_or_start(key, start)
+
+async def follow_shared_run(flight, thread_id=None, start=0):
+    """
+    Stream a run as (seq, event) from event number `start`, with heartbeats as (None, None).
+    Followers of a shared run get their own thread (a new one unless resuming), seeded with its result.
+    """
+    shared_thread = flight.context["thread_id"]
+    thread_id = thread_id or uuid.uuid4().hex
+    leader = thread_id == shared_thread
+
+    async for seq, e in flight.subscribe(start, heartbeat=SSE_HEARTBEAT):
+        if e is None:
+            yield seq, e
+            continue
+        if e["type"] == "thread":
+            e = {"type": "thread", "data": thread_id}
+        elif e["type"] == "stats" and not leader:
+            # Seeded before stats goes out: clients treat stats as the end and may hang up right away
+            await seed_thread(shared_thread, thread_id)
+            e = {"type": "stats", "data": {**e["data"], "thread_id": thread_id, "coalesced": True}}
+        yield seq, e
+
+async def seed_thread(shared_thread, thread_id):
+    """Copy a shared run's conversation to a follower's thread, so follow-up questions have its history."""
+    try:
+        snapshot = await graph.aget_state({"configurable": {"thread_id": shared_thread}})
+        if snapshot.values.get("messages"):
+            await graph.aupdate_state({"configurable": {"thread_id": thread_id}},
+                                      {"messages": snapshot.values["messages"]}, as_node="Tool_calling_llm")
+    except Exception:
+        logger.exception("could not seed coalesced thread %s", thread_id)
+
+def resume_run(req, last_event_id):
+    """The run and position a Last-Event-ID of the form "<run id>:<seq>" points at, or 404/410."""
+    run_id, _, seq = last_event_id.strip().rpartition(":")
+    if not run_id or not seq.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID.")
+    flight = single_flight.resume(run_id, int(seq) + 1)
+    if flight is None:
+        raise HTTPException(status_code=410 if run_id in single_flight.runs else 404,
+                            detail="This stream can no longer be resumed; ask again.")
+    # Followers of a shared run resume on the thread they were given, leaders on the run's own
+    return flight, req.get("thread_id") or flight.context["thread_id"], int(seq) + 1
+
+@app.post("/ask_stream")
+async def ask_stream(req: dict,x_api_key: Optional[str] = Header(None),last_event_id: Optional[str] = Header(None)):
+    """
+    Streams the run as server-sent events, each `id: <run id>:<seq>` plus one JSON `data:` line.
+    Every run executes in the background, so a client that lost the connection re-sends the
+    request with Last-Event-ID (and the thread_id it was given) to continue where it stopped.
+    """
+    verify_api_key(x_api_key)
+    if last_event_id:
+        flight, thread_id, start = resume_run(req, last_event_id)
+    else:
+        budget = request_budget(req, x_api_key)
+        stream_tokens = request_flag(req, "stream_tokens", STREAM_TOKENS)
+        speculative = request_flag(req, "speculative", SPECULATIVE_PREFETCH)
+        admit_or_429(admission.check_rate, x_api_key)
+        start = 0
+        if req.get("thread_id") or not COALESCE_QUERIES:
+            ticket = admit_or_429(admission.admit)
+            thread_id = req.get("thread_id") or uuid.uuid4().hex
+            flight = single_flight.start(lambda: (
+                run_graph(req["query"], thread_id, stream_tokens, ticket, budget, speculative),
+                {"thread_id": thread_id},
+            ))
+        else:
+            flight, leader = join_shared_run(req["query"], stream_tokens, budget, speculative)
+            thread_id = flight.context["thread_id"] if leader else None
+
+    async def event_generator():
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        async for seq, e in follow_shared_run(flight, thread_id, start):
+            if e is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield f"id: {flight.id}:{seq}\ndata: {json.dumps(e)}\n\n"
 
     return StreamingResponse(
         event_generator(),
-        media_type="text/event-stream"
+        media_type="text/event-stream",
+        # Proxies must pass events through as they come rather than buffer the response
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+#Batch research: many queries over one request, run through a bounded worker pool.
+#Identical tool calls across the batch are shared via the tool cache and in-flight dedupe.
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_QUERIES = int(os.environ.get("BATCH_MAX_QUERIES", "500"))
+#A batch costs one rate-limit token, so all batches of one key share BATCH_MAX_CONCURRENCY runs
+batch_slots = defaultdict(lambda: asyncio.Semaphore(BATCH_MAX_CONCURRENCY))
+
+async def admit_patiently():
+    """Batch work waits for capacity instead of failing with 429."""
+    while True:
+        try:
+            return admission.admit()
+        except AdmissionRejected as e:
+            await asyncio.sleep(e.retry_after)
+
+def batch_items(req, api_key):
+    """(id, query, budget) for each query of a batch request, or 400 naming the first bad one."""
+    queries = req.get("queries") or []
+    if not isinstance(queries, list):
+        raise HTTPException(status_code=400, detail="queries must be a list.")
+    if not queries:
+        raise HTTPException(status_code=400, detail="No queries given.")
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUERIES} queries per batch.")
+    items = []
+    for i, q in enumerate(queries):
+        query = q.get("query") if isinstance(q, dict) else q
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPException(status_code=400, detail=f"Query {i} has no query text.")
+        if isinstance(q, dict):
+            items.append((str(q.get("id", i)), query, request_budget({**req, **q}, api_key)))
+        else:
+            items.append((str(i), query, request_budget(req, api_key)))
+    return items
+
+@app.post("/ask_batch")
+async def ask_batch(req: dict,x_api_key: Optional[str] = Header(None)):
+    """
+    Body: {"queries": [{"id": "q1", "query": "..."}, ...] or ["...", ...], "concurrency": 8}
+    deadline_s / max_steps apply to each query and may also be set per query. Concurrent batches
+    of one API key together run at most BATCH_MAX_CONCURRENCY queries at a time.
+    Streams NDJSON events tagged with the query id, then one batch_done summary.
+    """
+    verify_api_key(x_api_key)
+    admit_or_429(admission.check_rate, x_api_key)
+    items = batch_items(req, x_api_key)
+    try:
+        concurrency = int(req.get("concurrency", BATCH_MAX_CONCURRENCY))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="concurrency must be an integer.")
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+    stream_tokens = request_flag(req, "stream_tokens", False)
+    slots = batch_slots[x_api_key]
+
+    async def worker(pending, out):
+        while pending:
+            qid, query, budget = pending.popleft()
+            try:
+                async with slots:
+                    ticket = await admit_patiently()
+                    async for e in run_graph(query, uuid.uuid4().hex, stream_tokens, ticket, budget):
+                        await out.put({"id": qid, **e})
+            except Exception as e:
+                logger.exception("batch query %s failed", qid)
+                await out.put({"id": qid, "type": "error", "data": str(e)})
+
+    async def event_generator():
+        start = time.perf_counter()
+        pending = deque(items)
+        out = asyncio.Queue(maxsize=1000)
+        workers = [asyncio.create_task(worker(pending, out)) for _ in range(concurrency)]
+        finished = asyncio.gather(*workers)
+        finished.add_done_callback(lambda _: asyncio.ensure_future(out.put(None)))
+        try:
+            while (e := await out.get()) is not None:
+                yield json.dumps(e) + "\n"
+        finally:
+            for w in workers:
+                w.cancel()
+        seconds = time.perf_counter() - start
+        yield json.dumps({"type": "batch_done", "data": {
+            "queries": len(items), "seconds": round(seconds, 3),
+            "queries_per_minute": round(len(items) * 60 / seconds, 1),
+        }}) + "\n"
+
+    return StreamingResponse(event_generator(), media_type="application/x-ndjson")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Nexus research agent utilities")
+    parser.add_argument("--graph", metavar="PATH", help="write the graph diagram (.png, or .mmd for mermaid source)")
+    args = parser.parse_args()
+    if args.graph:
+        fmt = "mermaid" if args.graph.endswith(".mmd") else "png"
+        data = render_graph(fmt)
+        with open(args.graph, "w" if fmt == "mermaid" else "wb") as f:
+            f.write(data)
+        print(f"Graph written to {args.graph}")
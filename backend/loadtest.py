@@ -0,0 +1,114 @@
+"""
+Load test for /ask_stream.
+
+Opens N concurrent research sessions against a running backend while probing
+/health, and reports how many sessions completed and how responsive the
+server stayed. Each session asks a different variant of the query, so
+identical in-flight questions are not coalesced into one run.
+
+Every session uses the one API key, which the per-key token bucket limits
+to RATE_LIMIT_BURST requests at once (10 by default); the rest get 429 and
+are reported as rate limited. Start the server with a burst at least as
+large as the biggest level:
+
+    RATE_LIMIT_BURST=1000 RATE_LIMIT_PER_MINUTE=100000 uvicorn langgraph_agent:app
+    python loadtest.py --sessions 10 20 50 100 --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+
+async def run_session(client, url, api_key, query):
+    start = time.perf_counter()
+    first_event = None
+    events = 0
+    async with client.stream("POST", f"{url}/ask_stream", json={"query": query},
+                             headers={"X-Api-Key": api_key}) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            # Server-sent events: only data lines carry events; ids, retry and heartbeats are skipped
+            if not line.startswith("data:"):
+                continue
+            event = json.loads(line[5:])
+            if first_event is None and event["type"] not in ("thread", "route"):
+                first_event = time.perf_counter() - start
+            events += 1
+    return time.perf_counter() - start, first_event, events
+
+
+async def probe_health(client, url, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get(f"{url}/health", timeout=5)
+            samples.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            samples.append(float("inf"))
+        await asyncio.sleep(0.25)
+
+
+async def run_level(url, api_key, query, sessions, timeout):
+    limits = httpx.Limits(max_connections=sessions + 4, max_keepalive_connections=sessions + 4)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        stop = asyncio.Event()
+        health = []
+        prober = asyncio.create_task(probe_health(client, url, stop, health))
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(run_session(client, url, api_key, f"{query} (session {i + 1} of {sessions})")
+              for i in range(sessions)),
+            return_exceptions=True,
+        )
+        wall = time.perf_counter() - start
+        stop.set()
+        await prober
+
+    ok = [r for r in results if not isinstance(r, BaseException)]
+    rate_limited = sum(isinstance(r, httpx.HTTPStatusError) and r.response.status_code == 429 for r in results)
+    failed = len(results) - len(ok) - rate_limited
+    durations = [r[0] for r in ok]
+    finite_health = [h for h in health if h != float("inf")]
+    return {
+        "sessions": sessions,
+        "ok": len(ok),
+        "failed": failed,
+        "rate_limited": rate_limited,
+        "wall_s": wall,
+        "session_p50_s": statistics.median(durations) if durations else None,
+        "health_max_ms": max(finite_health) * 1000 if finite_health else None,
+        "health_timeouts": len(health) - len(finite_health),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent session load test for /ask_stream")
+    parser.add_argument("--url", default=os.environ.get("NEXUS_BACKEND_URL", "http://127.0.0.1:8000"))
+    parser.add_argument("--api-key", default=os.environ.get("NEXUS_API_KEY", ""))
+    parser.add_argument("--query", default="What is retrieval augmented generation?")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--rate-limit-burst", type=int, default=int(os.environ.get("RATE_LIMIT_BURST", "10")),
+                        help="the server's RATE_LIMIT_BURST, to warn about levels that will be rate limited")
+    args = parser.parse_args()
+
+    print(f"{'sessions':>8} {'ok':>5} {'failed':>6} {'429':>5} {'wall s':>8} {'p50 s':>8} {'health max ms':>14} "
+          f"{'health t/o':>10}")
+    for level in args.sessions:
+        if level > args.rate_limit_burst:
+            print(f"note: {level} sessions exceed the server's per-key burst of {args.rate_limit_burst}; "
+                  "expect 429s unless RATE_LIMIT_BURST was raised (see --help)")
+        res = asyncio.run(run_level(args.url, args.api_key, args.query, level, args.timeout))
+        p50 = f"{res['session_p50_s']:.2f}" if res["session_p50_s"] is not None else "-"
+        hmax = f"{res['health_max_ms']:.1f}" if res["health_max_ms"] is not None else "-"
+        print(f"{res['sessions']:>8} {res['ok']:>5} {res['failed']:>6} {res['rate_limited']:>5} {res['wall_s']:>8.2f} "
+              f"{p50:>8} {hmax:>14} {res['health_timeouts']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Local BM25 index over documents the Arxiv and Wikipedia tools have returned.
+
+Every document a corpus tool fetches is appended to an on-disk inverted
+index, so later questions on the same topic can be answered from local hits
+in milliseconds instead of another upstream call. The index is
+log-structured:
+
+- New documents go to an in-memory buffer, searchable immediately, and are
+  written out as an immutable segment every `flush_docs` documents (and on
+  close).
+- A segment is a sorted term dictionary (JSON) plus one postings file of
+  packed uint32 (doc id, term frequency) pairs that is memory-mapped for
+  reading.
+- After each flush, adjacent segments of similar size are merged like a
+  binary counter, so there are O(log n) segments and every document is
+  rewritten O(log n) times. Merges run on a background thread; searches and
+  adds only wait for the merged segment to be swapped in.
+- Document text, lengths, offsets and dedupe keys live in append-only files.
+  manifest.json is replaced atomically after each flush and merge and is the
+  source of truth; anything written past it by an interrupted flush is cut
+  off on open.
+- One process writes an index at a time, holding a lock on its LOCK file.
+  Another process opening the same directory gets a read-only view of what
+  was flushed when it opened.
+
+    python local_index.py PATH "query"    # search an existing index
+"""
+import bisect
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from operator import itemgetter
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process writer lock
+    fcntl = None
+
+K1 = 1.2
+B = 0.75
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in into is it its of on or that the "
+    "their there these this to was were what when where which who why will with you your about also than then "
+    "they we our not no so such".split()
+)
+
+
+def tokenize(text):
+    return [t for t in TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def doc_key(doc):
+    """64-bit identity of a document: its URL, else its source and title, else its text."""
+    if doc.get("url"):
+        ident = doc["url"].rstrip("/").lower()
+    elif doc.get("title"):
+        ident = f"{doc.get('source', '')}:" + " ".join(doc["title"].lower().split())
+    else:
+        ident = "text:" + " ".join(str(doc.get("text", "")).lower().split())[:500]
+    return int.from_bytes(hashlib.blake2b(ident.encode(), digest_size=8).digest(), "little")
+
+
+def _load_array(path, typecode, count, truncate=True):
+    """Read the first `count` items of an append-only array file, cutting off anything after them."""
+    values = array(typecode)
+    if os.path.exists(path):
+        with open(path, "r+b" if truncate else "rb") as f:
+            values.frombytes(f.read(count * values.itemsize))
+            if truncate:
+                f.truncate(count * values.itemsize)
+    if len(values) != count:
+        raise ValueError(f"{path} holds {len(values)} entries, manifest expects {count}")
+    return values
+
+
+def _append_array(path, values):
+    with open(path, "ab") as f:
+        values.tofile(f)
+
+
+class Segment:
+    """One immutable segment: a term dictionary and memory-mapped postings."""
+
+    def __init__(self, directory, name, docs):
+        self.name = name
+        self.docs = docs
+        with open(os.path.join(directory, name + ".terms"), encoding="utf-8") as f:
+            self.terms = json.load(f)
+        path = os.path.join(directory, name + ".post")
+        if os.path.getsize(path):
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._postings = memoryview(self._mmap).cast("I")
+        else:
+            self._postings = memoryview(array("I"))
+
+    def postings(self, term):
+        """Flat view of the term's (doc id, tf) pairs."""
+        entry = self.terms.get(term)
+        if entry is None:
+            return self._postings[0:0]
+        offset, df = entry
+        return self._postings[offset: offset + 2 * df]
+
+    @staticmethod
+    def write(directory, name, postings):
+        """Write a segment from {term: array("I") of flat (doc id, tf) pairs in doc id order}."""
+        terms = {}
+        offset = 0
+        with open(os.path.join(directory, name + ".post"), "wb") as f:
+            for term in sorted(postings):
+                pairs = postings[term]
+                f.write(pairs)
+                terms[term] = [offset, len(pairs) // 2]
+                offset += len(pairs)
+        with open(os.path.join(directory, name + ".terms"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(terms, separators=(",", ":")))
+
+
+class LocalIndex:
+    def __init__(self, path="local_index", flush_docs=64, max_doc_chars=4000, max_df_ratio=0.25, probe_ratio=4,
+                 max_candidates=5000):
+        self.path = path
+        self.flush_docs = flush_docs
+        self.max_doc_chars = max_doc_chars
+        self.max_df_ratio = max_df_ratio
+        self.probe_ratio = probe_ratio
+        self.max_candidates = max_candidates
+        self.stats = {"ingested": 0, "duplicates": 0, "queries": 0, "hits": 0, "flushes": 0, "merges": 0}
+        self._lock = threading.Lock()
+        self._merge_thread = None
+        os.makedirs(path, exist_ok=True)
+        self.read_only = not self._lock_writer()
+
+        manifest = {"segments": [], "docs": 0, "docs_bytes": 0, "total_len": 0, "next_segment": 0}
+        if os.path.exists(self._file("manifest.json")):
+            with open(self._file("manifest.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+        self._next_segment = manifest["next_segment"]
+        self._docs_bytes = manifest["docs_bytes"]
+        self._total_len = manifest["total_len"]
+        self._persisted = manifest["docs"]
+        self._segments = [Segment(path, s["name"], s["docs"]) for s in manifest["segments"]]
+        writable = not self.read_only
+        if writable:
+            self._remove_orphans()
+            with open(self._file("docs.jsonl"), "ab") as f:
+                f.truncate(self._docs_bytes)
+        self._offsets = _load_array(self._file("docs.off"), "Q", self._persisted, writable)
+        self._doclens = _load_array(self._file("doclens.bin"), "I", self._persisted, writable)
+        self._keys = set(_load_array(self._file("keys.bin"), "Q", self._persisted, writable))
+        self._reset_buffer()
+        if writable:
+            with self._lock:
+                self._start_merge()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _lock_writer(self):
+        """Take the directory's writer lock; False if another process (or instance) holds it."""
+        self._lock_file = open(self._file("LOCK"), "a")
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def _reset_buffer(self):
+        # Replaced, never cleared, so searches holding the old buffer keep a consistent view
+        self._buffer = {}
+        self._buffer_docs = []
+        self._buffer_keys = array("Q")
+
+    def _remove_orphans(self):
+        """Delete segment files no longer in the manifest (left by a crash, or still mapped when merged away)."""
+        live = {s.name for s in self._segments}
+        for entry in os.listdir(self.path):
+            stem, ext = os.path.splitext(entry)
+            if ext in (".terms", ".post") and stem not in live:
+                try:
+                    os.remove(self._file(entry))
+                except OSError:
+                    pass
+
+    def __len__(self):
+        return len(self._doclens)
+
+    def add(self, docs):
+        """Index documents ({"title", "url", "text", "source"}); returns how many were new (none when read-only)."""
+        if self.read_only:
+            return 0
+        added = 0
+        with self._lock:
+            for doc in docs:
+                text = " ".join(str(doc.get("text") or "").split())[: self.max_doc_chars]
+                key = doc_key(doc)
+                if not text or key in self._keys:
+                    self.stats["duplicates"] += 1
+                    continue
+                record = {"title": doc.get("title") or "", "url": doc.get("url") or "", "text": text,
+                          "source": doc.get("source") or ""}
+                tokens = tokenize(f"{record['title']} {text}")
+                doc_id = len(self._doclens)
+                for term, tf in Counter(tokens).items():
+                    self._buffer.setdefault(term, array("I")).extend((doc_id, tf))
+                self._doclens.append(len(tokens))
+                self._total_len += len(tokens)
+                self._keys.add(key)
+                self._buffer_keys.append(key)
+                self._buffer_docs.append(record)
+                added += 1
+            self.stats["ingested"] += added
+            if len(self._buffer_docs) >= self.flush_docs:
+                self._flush()
+        return added
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer_docs:
+            return
+        offsets = array("Q")
+        with open(self._file("docs.jsonl"), "ab") as f:
+            for record in self._buffer_docs:
+                line = json.dumps(record, ensure_ascii=False).encode() + b"\n"
+                offsets.append(self._docs_bytes)
+                f.write(line)
+                self._docs_bytes += len(line)
+        _append_array(self._file("docs.off"), offsets)
+        _append_array(self._file("doclens.bin"), self._doclens[self._persisted:])
+        _append_array(self._file("keys.bin"), self._buffer_keys)
+
+        name = self._new_segment_name()
+        Segment.write(self.path, name, self._buffer)
+        self._segments = self._segments + [Segment(self.path, name, len(self._buffer_docs))]
+        self._offsets.extend(offsets)
+        self._persisted = len(self._doclens)
+        self._write_manifest()
+        self._reset_buffer()
+        self.stats["flushes"] += 1
+        self._start_merge()
+
+    def _write_manifest(self):
+        manifest = {"segments": [{"name": s.name, "docs": s.docs} for s in self._segments],
+                    "docs": self._persisted, "docs_bytes": self._docs_bytes,
+                    "total_len": self._total_len, "next_segment": self._next_segment}
+        with open(self._file("manifest.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(self._file("manifest.json.tmp"), self._file("manifest.json"))
+
+    def _new_segment_name(self):
+        self._next_segment += 1
+        return f"seg-{self._next_segment:06d}"
+
+    def _mergeable(self):
+        """Position of the newest adjacent pair whose older segment is no bigger than the newer one, or None."""
+        for i in range(len(self._segments) - 2, -1, -1):
+            if self._segments[i].docs <= self._segments[i + 1].docs:
+                return i
+        return None
+
+    def _start_merge(self):
+        """Start the merge thread if segments need merging and it is not running; called holding the lock."""
+        if self._merge_thread is None and self._mergeable() is not None:
+            self._merge_thread = threading.Thread(target=self._merge_loop, name="local-index-merge", daemon=True)
+            self._merge_thread.start()
+
+    def _merge_loop(self):
+        """Merge segments until none need it. Only picking a pair and swapping in the result hold the lock."""
+        try:
+            while True:
+                with self._lock:
+                    i = self._mergeable()
+                    if i is None:
+                        self._merge_thread = None
+                        return
+                    older, newer = self._segments[i: i + 2]
+                    name = self._new_segment_name()
+                merged = self._merge(older, newer, name)
+                with self._lock:
+                    # Flushes only append segments, so the pair is still adjacent, maybe no longer last
+                    i = self._segments.index(older)
+                    self._segments = self._segments[:i] + [merged] + self._segments[i + 2:]
+                    self._write_manifest()
+                    self._remove_orphans()
+                    self.stats["merges"] += 1
+        except BaseException:
+            with self._lock:
+                self._merge_thread = None
+            raise
+
+    def _merge(self, older, newer, name):
+        """Concatenate two adjacent segments' postings; doc ids stay in order because `older` precedes `newer`."""
+        terms = {}
+        offset = 0
+        with open(self._file(name + ".post"), "wb") as f:
+            for term in sorted(older.terms.keys() | newer.terms.keys()):
+                df = 0
+                for segment in (older, newer):
+                    pairs = segment.postings(term)
+                    f.write(pairs)
+                    df += len(pairs) // 2
+                terms[term] = [offset, df]
+                offset += 2 * df
+        with open(self._file(name + ".terms"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(terms, separators=(",", ":")))
+        return Segment(self.path, name, older.docs + newer.docs)
+
+    def search(self, query, k=3):
+        """Top-k documents by BM25, each with its score."""
+        terms = set(tokenize(query))
+        with self._lock:
+            segments, buffer, buffer_docs = self._segments, self._buffer, self._buffer_docs
+            persisted, total_len, n = self._persisted, self._total_len, len(self._doclens)
+            buffered = {t: buffer[t][:] for t in terms if t in buffer}
+            self.stats["queries"] += 1
+        if not n or not terms:
+            return []
+
+        sources = {t: [s.postings(t) for s in segments if t in s.terms] + ([buffered[t]] if t in buffered else [])
+                   for t in terms}
+        dfs = {t: sum(len(p) // 2 for p in sources[t]) for t in terms}
+        terms = [t for t in terms if dfs[t]]
+        # Terms in most documents barely move BM25 but cost the most to score; skip them if anything rarer matched
+        terms = [t for t in terms if dfs[t] <= self.max_df_ratio * n] or terms
+
+        doclens = self._doclens
+        c1 = K1 * (1 - B)
+        c2 = K1 * B / (total_len / n or 1)
+        scores = {}
+        get = scores.get
+        # Rarest terms first. Candidates are cut to the best max_candidates by partial score, and a
+        # term whose postings dwarf the candidates only adds to them, found by binary search on its
+        # doc ids, instead of scanning every posting.
+        for term in sorted(terms, key=dfs.get):
+            df = dfs[term]
+            weight = math.log(1 + (n - df + 0.5) / (df + 0.5)) * (K1 + 1)
+            if scores and df > self.probe_ratio * len(scores):
+                candidates = sorted(scores)
+                for pairs in sources[term]:
+                    doc_ids = pairs[::2]
+                    for doc_id in candidates:
+                        i = bisect.bisect_left(doc_ids, doc_id)
+                        if i < len(doc_ids) and doc_ids[i] == doc_id:
+                            tf = pairs[2 * i + 1]
+                            scores[doc_id] += weight * tf / (tf + c1 + c2 * doclens[doc_id])
+                continue
+            for pairs in sources[term]:
+                for doc_id, tf in zip(pairs[::2], pairs[1::2]):
+                    scores[doc_id] = get(doc_id, 0.0) + weight * tf / (tf + c1 + c2 * doclens[doc_id])
+            if len(scores) > self.max_candidates:
+                scores = dict(heapq.nlargest(self.max_candidates, scores.items(), key=itemgetter(1)))
+                get = scores.get
+
+        top = heapq.nlargest(k, scores.items(), key=itemgetter(1))
+        if top:
+            with self._lock:
+                self.stats["hits"] += 1
+        return [{**self._document(doc_id, persisted, buffer_docs), "score": round(score, 3)} for doc_id, score in top]
+
+    def _document(self, doc_id, persisted, buffer_docs):
+        if doc_id >= persisted:
+            return dict(buffer_docs[doc_id - persisted])
+        with open(self._file("docs.jsonl"), "rb") as f:
+            f.seek(self._offsets[doc_id])
+            return json.loads(f.readline())
+
+    def close(self):
+        """Flush buffered documents, wait for merges to finish and release the writer lock."""
+        self.flush()
+        with self._lock:
+            merging = self._merge_thread
+        if merging is not None:
+            merging.join()
+        self._lock_file.close()
+
+    def disk_bytes(self):
+        return sum(os.path.getsize(self._file(e)) for e in os.listdir(self.path))
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["docs"] = len(self._doclens)
+            stats["buffered_docs"] = len(self._buffer_docs)
+            stats["segments"] = len(self._segments)
+            stats["merging"] = self._merge_thread is not None
+            stats["read_only"] = self.read_only
+        stats["hit_ratio"] = round(stats["hits"] / stats["queries"], 4) if stats["queries"] else 0.0
+        return stats
+
+
+class LocalCorpusSearch:
+    """Tool wrapper in the search clients' shape: invoke({"query": ...}) returns Tavily-style result dicts."""
+
+    def __init__(self, index, top_k_results=3, doc_content_chars_max=500):
+        self.index = index
+        self.top_k_results = top_k_results
+        self.doc_content_chars_max = doc_content_chars_max
+
+    def invoke(self, kwargs):
+        hits = self.index.search(kwargs["query"], self.top_k_results)
+        if not hits:
+            return "No local results were found"
+        return [
+            {"title": h["title"], "url": h["url"], "content": h["text"][: self.doc_content_chars_max],
+             "source": h["source"], "score": h["score"]}
+            for h in hits
+        ]
+
+
+if __name__ == "__main__":
+    import sys
+
+    index = LocalIndex(sys.argv[1])
+    for hit in index.search(" ".join(sys.argv[2:]), 5):
+        print(f"{hit['score']:>7.3f}  [{hit['source']}] {hit['title']}  {hit['url']}")
@@ -0,0 +1,202 @@
+"""
+Latency-aware routing and failover over an ordered pool of chat models.
+
+Each backend (Groq, or any OpenAI-compatible server such as a local vLLM,
+llama.cpp or Ollama endpoint) keeps an EWMA of its call latency and of its
+failure rate. Calls are streamed, so a stall is caught by a first-token or
+between-chunk timeout rather than only when the whole call ends. A request
+goes to the healthy backend with the lowest expected
+time per successful call, latency / (1 - error rate); backends never measured
+rank after measured ones, in pool order, so the first backend is the primary.
+A timeout, a 429 or any other error moves on to the next backend in that
+order and puts the failed one in a cooldown that doubles with consecutive
+failures (a 429's Retry-After is honoured). Every `explore_every`-th request
+goes to the least recently used healthy backend first, so a backend that was
+slow or never tried gets re-measured and traffic returns once it recovers.
+
+The pool looks like a chat model to the graph: ainvoke(messages) and
+bind_tools(tools), with one lazily built model (and tool binding) per
+backend.
+"""
+import asyncio
+import logging
+import time
+
+from langchain_core.messages import message_chunk_to_message
+
+logger = logging.getLogger("nexus")
+
+
+def failure_kind(error):
+    """Classify an exception from a chat call as "timeout", "rate_limited" or "error"."""
+    if isinstance(error, asyncio.TimeoutError) or "timeout" in type(error).__name__.lower():
+        return "timeout"
+    if getattr(error, "status_code", None) == 429 or "ratelimit" in type(error).__name__.lower():
+        return "rate_limited"
+    return "error"
+
+
+def retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class Backend:
+    def __init__(self, name, build, first_token_timeout_s=15.0, stall_timeout_s=15.0):
+        self.name = name
+        self.build = build
+        self.first_token_timeout_s = first_token_timeout_s
+        self.stall_timeout_s = stall_timeout_s
+        self.latency = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.last_used = 0.0
+        self.stats = {"requests": 0, "ok": 0, "timeouts": 0, "rate_limited": 0, "errors": 0}
+        self._model = None
+        self._bound = {}
+
+    def model(self, binding=None):
+        """The backend's chat model, bound to the binding's tools if given (built once each)."""
+        if self._model is None:
+            self._model = self.build()
+        if binding is None:
+            return self._model
+        if binding.key not in self._bound:
+            self._bound[binding.key] = self._model.bind_tools(binding.tools, **binding.kwargs)
+        return self._bound[binding.key]
+
+    def expected_latency(self):
+        """Expected seconds per successful call; None until measured."""
+        if self.latency is None:
+            return None
+        return self.latency / (1 - min(self.error_rate, 0.95))
+
+
+class ModelPool:
+    def __init__(self, backends, alpha=0.3, cooldown_s=15.0, max_cooldown_s=120.0, explore_every=20):
+        if not backends:
+            raise ValueError("the model pool needs at least one backend")
+        self.backends = list(backends)
+        self.alpha = alpha
+        self.cooldown_s = cooldown_s
+        self.max_cooldown_s = max_cooldown_s
+        self.explore_every = explore_every
+        self.stats = {"requests": 0, "failovers": 0, "exhausted": 0, "explorations": 0}
+
+    def order(self):
+        """Backends to try for the next request, best first."""
+        now = time.monotonic()
+        healthy = [b for b in self.backends if b.cooldown_until <= now]
+        cooling = sorted((b for b in self.backends if b.cooldown_until > now), key=lambda b: b.cooldown_until)
+        measured = sorted((b for b in healthy if b.latency is not None), key=Backend.expected_latency)
+        ordered = measured + [b for b in healthy if b.latency is None]
+        if len(ordered) > 1 and self.explore_every and self.stats["requests"] % self.explore_every == 0:
+            explore = min(ordered[1:], key=lambda b: b.last_used)
+            ordered.remove(explore)
+            ordered.insert(0, explore)
+            self.stats["explorations"] += 1
+        # Backends in cooldown are a last resort rather than a reason to fail the request
+        return ordered + cooling
+
+    def record(self, backend, seconds, kind=None):
+        backend.last_used = time.monotonic()
+        backend.stats["requests"] += 1
+        a = self.alpha
+        if kind is None:
+            backend.stats["ok"] += 1
+            # The first success after failures starts a fresh estimate, since timeouts only bounded it from below
+            fresh = backend.latency is None or backend.failures
+            backend.latency = seconds if fresh else a * seconds + (1 - a) * backend.latency
+            backend.error_rate *= 1 - a
+            backend.failures = 0
+            return
+        backend.stats[{"timeout": "timeouts", "rate_limited": "rate_limited"}.get(kind, "errors")] += 1
+        backend.error_rate = a + (1 - a) * backend.error_rate
+        if kind == "timeout":
+            # A timeout says the backend is at least this slow
+            backend.latency = seconds if backend.latency is None else max(backend.latency, seconds)
+        backend.failures += 1
+
+    def cool_down(self, backend, error):
+        seconds = min(self.cooldown_s * 2 ** (backend.failures - 1), self.max_cooldown_s)
+        backend.cooldown_until = time.monotonic() + max(seconds, retry_after(error) or 0)
+
+    async def attempt(self, model, backend, messages, **kwargs):
+        """Stream one call from one backend, failing if the first chunk or any later one is too slow."""
+        stream = model.astream(messages, **kwargs).__aiter__()
+        message = None
+        timeout = backend.first_token_timeout_s
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                message = chunk if message is None else message + chunk
+                timeout = backend.stall_timeout_s
+        finally:
+            await stream.aclose()
+        if message is None:
+            raise RuntimeError(f"LLM backend {backend.name} returned no output")
+        return message_chunk_to_message(message)
+
+    async def ainvoke(self, messages, binding=None, **kwargs):
+        self.stats["requests"] += 1
+        order = self.order()
+        last_error = None
+        for attempt, backend in enumerate(order):
+            if attempt:
+                self.stats["failovers"] += 1
+                logger.warning("LLM backend %s failed (%r), failing over to %s", order[attempt - 1].name,
+                               last_error, backend.name)
+            start = time.perf_counter()
+            try:
+                # Built outside the timing so a backend's one-off client setup does not count as latency
+                model = backend.model(binding)
+                start = time.perf_counter()
+                # A backend that fails after streaming some tokens is retried in full on the next one;
+                # the retry streams under a new message id, which run_graph turns into answer_reset
+                response = await self.attempt(model, backend, messages, **kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.record(backend, time.perf_counter() - start, failure_kind(e))
+                self.cool_down(backend, e)
+                last_error = e
+                continue
+            self.record(backend, time.perf_counter() - start)
+            response.response_metadata["llm_backend"] = backend.name
+            return response
+        self.stats["exhausted"] += 1
+        raise last_error
+
+    def bind_tools(self, tools, **kwargs):
+        return PoolBinding(self, tools, kwargs)
+
+    def snapshot(self):
+        """Flat counters: pool totals plus <backend>_<field> per backend."""
+        now = time.monotonic()
+        stats = dict(self.stats)
+        for b in self.backends:
+            stats.update({f"{b.name}_{k}": v for k, v in b.stats.items()})
+            stats[f"{b.name}_ewma_latency_s"] = round(b.latency, 4) if b.latency is not None else -1
+            stats[f"{b.name}_error_rate"] = round(b.error_rate, 4)
+            stats[f"{b.name}_cooling_down"] = int(b.cooldown_until > now)
+        return stats
+
+
+class PoolBinding:
+    """The pool with tools bound: each backend gets its own binding of the same tools."""
+
+    def __init__(self, pool, tools, kwargs):
+        self.pool = pool
+        self.tools = tools
+        self.kwargs = kwargs
+        self.key = (tuple(getattr(t, "name", repr(t)) for t in tools), repr(sorted(kwargs.items())))
+
+    async def ainvoke(self, messages, **kwargs):
+        return await self.pool.ainvoke(messages, binding=self, **kwargs)
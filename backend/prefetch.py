@@ -0,0 +1,104 @@
+"""
+Speculative tool prefetch, run alongside the first LLM call of a request.
+
+The first step of most research turns is the LLM calling Wikipedia or Arxiv
+with little more than the user's own words, so the first LLM round-trip and
+the first tool round-trip run back to back. With speculation on, those
+likely calls start as soon as the request does. When the LLM then asks for a
+call that matches a prefetch (same tool, same query once case, punctuation
+and question phrasing are stripped) it gets the prefetched result instead of
+waiting for a fresh call. Prefetches no call claimed by the end of the
+request count as wasted.
+
+    python prefetch.py "Who was Ada Lovelace?"    # show the canonical query
+"""
+import asyncio
+import re
+import time
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+QUESTION = re.compile(
+    r"^(please |can you |could you )*"
+    r"(tell me (about|what|who)|what (is|are|was|were)|who (is|was|were)|explain|describe|define|"
+    r"search( for)?|find|look up|give me an overview of|overview of|information on|info on)\s+"
+    r"((the|a|an) )?"
+)
+
+
+def canonical_query(query):
+    """Lower-case, strip punctuation and leading question phrasing: "Who was Ada Lovelace?" -> "ada lovelace"."""
+    text = " ".join(PUNCTUATION.sub(" ", str(query).lower()).split())
+    return QUESTION.sub("", text) or text
+
+
+class PrefetchStats:
+    def __init__(self):
+        # hits: prefetches at least one call used; served: calls answered from a prefetch
+        self.stats = {"requests": 0, "issued": 0, "hits": 0, "served": 0, "wasted": 0, "errors": 0, "saved_s": 0.0}
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["saved_s"] = round(stats["saved_s"], 3)
+        stats["hit_ratio"] = round(stats["hits"] / stats["issued"], 4) if stats["issued"] else 0.0
+        stats["waste_ratio"] = round(stats["wasted"] / stats["issued"], 4) if stats["issued"] else 0.0
+        return stats
+
+
+class Speculation:
+    """The prefetches of one request."""
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.prefetches = {}
+        self.stats.stats["requests"] += 1
+
+    def start(self, calls, run):
+        """Start `run(name, args)` for each (tool name, query) not already prefetched."""
+        for name, query in calls:
+            key = (name, canonical_query(query))
+            if key in self.prefetches:
+                continue
+            task = asyncio.ensure_future(run(name, {"query": key[1]}))
+            prefetch = {"task": task, "started": time.perf_counter(), "finished": None, "claims": 0}
+            task.add_done_callback(lambda _, p=prefetch: p.update(finished=time.perf_counter()))
+            self.prefetches[key] = prefetch
+            self.stats.stats["issued"] += 1
+
+    def claim(self, name, args):
+        """The still-usable prefetch matching this tool call, or None."""
+        prefetch = self.prefetches.get((name, canonical_query(args.get("query", ""))))
+        if prefetch is None:
+            return None
+        task = prefetch["task"]
+        if task.cancelled() or (task.done() and task.exception() is not None):
+            return None
+        if not prefetch["claims"]:
+            # Time the call had already been running when it was needed is time the LLM step did not wait
+            self.stats.stats["saved_s"] += (prefetch["finished"] or time.perf_counter()) - prefetch["started"]
+            self.stats.stats["hits"] += 1
+        prefetch["claims"] += 1
+        self.stats.stats["served"] += 1
+        return task
+
+    def finish(self):
+        """Count unclaimed and failed prefetches and cancel any still running. Returns this request's counts."""
+        counts = {"issued": len(self.prefetches), "hits": 0, "served": 0, "wasted": 0}
+        for prefetch in self.prefetches.values():
+            task = prefetch["task"]
+            if prefetch["claims"]:
+                counts["hits"] += 1
+                counts["served"] += prefetch["claims"]
+                continue
+            counts["wasted"] += 1
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled() and task.exception() is not None:
+                self.stats.stats["errors"] += 1
+        self.stats.stats["wasted"] += counts["wasted"]
+        return counts
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(canonical_query(" ".join(sys.argv[1:])))
@@ -0,0 +1,69 @@
+"""
+Fast-path query router, run before the first LLM call of a turn.
+
+A few precompiled keyword patterns decide whether a query needs tools at
+all (greetings, thanks, arithmetic and rewriting of text the user pasted go
+straight to a tool-free LLM call) and, if it does, which tools are
+relevant: Arxiv for papers, Tavily for current events, Wikipedia for
+encyclopedic facts. Queries that match nothing keep every tool bound, so a
+miss costs nothing compared to not routing.
+
+    python router.py "latest news on fusion"    # show the route for a query
+"""
+import re
+
+ALL_TOOLS = ("arxiv", "wikipedia", "tavily_search_results_json")
+
+SMALL_TALK = re.compile(
+    r"^\s*(hi|hello|hey|yo|hiya|good (morning|afternoon|evening)|thanks?( you)?|thank you( so much)?|thx|"
+    r"ok(ay)?|cool|great|nice|bye|goodbye|see you|how are you( doing)?|who are you|what can you do)"
+    r"([\s!.,]+(that|this) (helps|helped|is (great|helpful|perfect))|[\s!.,]+(got it|perfect|much appreciated))?"
+    r"[\s!.?,]*(nexus)?[\s!.?]*$",
+    re.IGNORECASE,
+)
+ARITHMETIC = re.compile(r"^\s*(what is|what's|calculate|compute)?\s*[\d\s.+\-*/^%()=x]+\??\s*$", re.IGNORECASE)
+OPERATION = re.compile(r"\d\s*[-+*/^%x]\s*\(?\s*\d")
+TEXT_TASK = re.compile(
+    r"^\s*(please\s+)?(rewrite|rephrase|paraphrase|translate|summari[sz]e|proofread|fix the grammar|shorten)\b"
+    r".*[:\n].{40,}",
+    re.IGNORECASE | re.DOTALL,
+)
+
+TOOL_HINTS = {
+    "arxiv": re.compile(
+        r"\b(papers?|arxiv|preprints?|publications?|published|journal|peer[- ]reviewed|citations?|"
+        r"et al\.?|authors?|literature|survey of|state of the art|sota|benchmarks?)\b",
+        re.IGNORECASE,
+    ),
+    "tavily_search_results_json": re.compile(
+        r"\b(latest|news|today|tonight|yesterday|this (week|month|year)|currently|current|recent(ly)?|"
+        r"right now|upcoming|price|stock|weather|score|election|released?|announced?|20[2-3]\d)\b",
+        re.IGNORECASE,
+    ),
+    "wikipedia": re.compile(
+        r"\b(who (is|was|were)|what (is|was|are) (a|an|the)|history of|biography|born|died|founded|"
+        r"capital of|population of|define|definition of|meaning of|origin of)\b",
+        re.IGNORECASE,
+    ),
+}
+
+
+def route(query):
+    """Return {"kind": "direct" | "subset" | "all", "tools": [...], "reason": str} for one query."""
+    if SMALL_TALK.match(query):
+        return {"kind": "direct", "tools": [], "reason": "small talk"}
+    if ARITHMETIC.match(query) and OPERATION.search(query):
+        return {"kind": "direct", "tools": [], "reason": "arithmetic"}
+    if TEXT_TASK.match(query):
+        return {"kind": "direct", "tools": [], "reason": "text task"}
+
+    matched = [name for name in ALL_TOOLS if TOOL_HINTS[name].search(query)]
+    if matched and len(matched) < len(ALL_TOOLS):
+        return {"kind": "subset", "tools": matched, "reason": "keywords"}
+    return {"kind": "all", "tools": list(ALL_TOOLS), "reason": "default"}
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(route(" ".join(sys.argv[1:])))
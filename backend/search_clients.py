@@ -0,0 +1,114 @@
+"""
+Tavily, Arxiv and Wikipedia clients on the shared HTTP pool.
+
+The LangChain community wrappers open their own connections (module-level
+`requests` calls, a fresh arxiv client per search) and cannot take an
+injected client. These talk to the same public APIs through
+`http_pool.sync_client()` and return output in the wrappers' formats, so
+the agent, the cache and the token budget see identical payloads. Arxiv and
+Wikipedia also expose search(), the full documents before the wrappers'
+truncation, which the agent adds to its local index (see local_index.py).
+Base URLs are configurable so the clients can be pointed at a local stub
+server.
+"""
+import os
+import xml.etree.ElementTree as ET
+
+import http_pool
+
+TAVILY_BASE_URL = os.environ.get("TAVILY_BASE_URL", "https://api.tavily.com")
+ARXIV_BASE_URL = os.environ.get("ARXIV_BASE_URL", "https://export.arxiv.org")
+WIKIPEDIA_BASE_URL = os.environ.get("WIKIPEDIA_BASE_URL", "https://en.wikipedia.org")
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+class TavilySearch:
+    def __init__(self, api_key, max_results=5, base_url=TAVILY_BASE_URL):
+        self.api_key = api_key
+        self.max_results = max_results
+        self.base_url = base_url.rstrip("/")
+
+    def invoke(self, kwargs):
+        r = http_pool.sync_client().post(
+            f"{self.base_url}/search",
+            json={"query": kwargs["query"], "max_results": self.max_results, "search_depth": "advanced"},
+            headers={"Authorization": f"Bearer {self.api_key}"},
+        )
+        r.raise_for_status()
+        return [
+            {"title": x.get("title", ""), "url": x.get("url", ""), "content": x.get("content", ""),
+             "score": x.get("score")}
+            for x in r.json().get("results", [])
+        ]
+
+
+class ArxivSearch:
+    def __init__(self, top_k_results=2, doc_content_chars_max=500, base_url=ARXIV_BASE_URL):
+        self.top_k_results = top_k_results
+        self.doc_content_chars_max = doc_content_chars_max
+        self.base_url = base_url.rstrip("/")
+
+    def search(self, kwargs):
+        """Full documents as [{"title", "url", "content", "published", "authors"}], before truncation."""
+        r = http_pool.sync_client().get(
+            f"{self.base_url}/api/query",
+            params={"search_query": f"all:{kwargs['query'][:300]}", "start": 0, "max_results": self.top_k_results},
+        )
+        r.raise_for_status()
+        docs = []
+        for entry in ET.fromstring(r.content).iter(f"{ATOM}entry"):
+            docs.append({
+                "title": " ".join((entry.findtext(f"{ATOM}title") or "").split()),
+                "url": (entry.findtext(f"{ATOM}id") or "").strip(),
+                "content": " ".join((entry.findtext(f"{ATOM}summary") or "").split()),
+                "published": (entry.findtext(f"{ATOM}updated") or "")[:10],
+                "authors": ", ".join(a.findtext(f"{ATOM}name") or "" for a in entry.iter(f"{ATOM}author")),
+            })
+        return docs
+
+    def format(self, docs):
+        if not docs:
+            return "No good Arxiv Result was found"
+        return "\n\n".join(
+            f"Published: {d['published']}\nTitle: {d['title']}\nAuthors: {d['authors']}\nSummary: {d['content']}"
+            for d in docs
+        )[: self.doc_content_chars_max]
+
+    def invoke(self, kwargs):
+        return self.format(self.search(kwargs))
+
+
+class WikipediaSearch:
+    def __init__(self, top_k_results=2, doc_content_chars_max=500, base_url=WIKIPEDIA_BASE_URL):
+        self.top_k_results = top_k_results
+        self.doc_content_chars_max = doc_content_chars_max
+        self.base_url = base_url.rstrip("/")
+
+    def search(self, kwargs):
+        """Full page intros as [{"title", "url", "content"}], before truncation."""
+        client = http_pool.sync_client()
+        r = client.get(f"{self.base_url}/w/api.php", params={
+            "action": "query", "list": "search", "srsearch": kwargs["query"][:300],
+            "srlimit": self.top_k_results, "format": "json",
+        })
+        r.raise_for_status()
+        titles = [x["title"] for x in r.json().get("query", {}).get("search", [])]
+        if not titles:
+            return []
+        r = client.get(f"{self.base_url}/w/api.php", params={
+            "action": "query", "prop": "extracts", "exintro": 1, "explaintext": 1, "redirects": 1,
+            "titles": "|".join(titles), "format": "json",
+        })
+        r.raise_for_status()
+        pages = {p.get("title"): p.get("extract", "") for p in r.json().get("query", {}).get("pages", {}).values()}
+        return [{"title": t, "url": "https://en.wikipedia.org/wiki/" + t.replace(" ", "_"), "content": pages[t]}
+                for t in titles if pages.get(t)]
+
+    def format(self, docs):
+        if not docs:
+            return "No good Wikipedia Search Result was found"
+        return "\n\n".join(f"Page: {d['title']}\nSummary: {d['content']}" for d in docs)[: self.doc_content_chars_max]
+
+    def invoke(self, kwargs):
+        return self.format(self.search(kwargs))
@@ -0,0 +1,156 @@
+"""
+Single-flight execution with fan-out.
+
+Concurrent callers asking for the same key share one background run. Every
+event the run produces goes into a bounded replay buffer that subscribers
+read from the start, so callers that join late still see the whole stream.
+Finished runs stay joinable for a short TTL.
+
+Every run, shared or not, also has an id, and its events are numbered in
+order, so a caller that lost its connection can look the run up again and
+resume after the last event it received, while that event is still buffered.
+A subscriber that falls so far behind that events it has not read are
+evicted gets an error event and no more: a stream with a gap in it would
+silently lose tokens of the answer.
+"""
+import asyncio
+import time
+import uuid
+from collections import deque
+
+
+class Flight:
+    def __init__(self, key, max_events):
+        self.key = key
+        self.id = uuid.uuid4().hex
+        self.events = deque(maxlen=max_events)
+        self.offset = 0
+        self.done = False
+        self.finished_at = None
+        self.task = None
+        self.context = {}
+        self._cond = asyncio.Condition()
+
+    @property
+    def overflowed(self):
+        return self.offset > 0
+
+    async def publish(self, event):
+        async with self._cond:
+            if len(self.events) == self.events.maxlen:
+                self.offset += 1
+            self.events.append(event)
+            self._cond.notify_all()
+
+    async def close(self):
+        async with self._cond:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._cond.notify_all()
+
+    def replayable(self, seq):
+        """Whether events from number `seq` on are all still buffered."""
+        return seq >= self.offset
+
+    async def subscribe(self, start=0, heartbeat=None):
+        """
+        Yield (seq, event) for buffered events from number `start`, then live
+        events until the run finishes. With `heartbeat`, (None, None) is
+        yielded whenever that many seconds pass without an event. Ends with
+        an error event if events it had yet to yield were evicted.
+        """
+        i = start
+        while True:
+            idle = False
+            async with self._cond:
+                if i >= self.offset + len(self.events) and not self.done:
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        idle = True
+                offset = self.offset
+                batch = list(self.events)[i - offset:] if i >= offset else []
+                finished = self.done
+            if i < offset:
+                yield i, {"type": "error", "data": f"Fell behind the stream: events {i}-{offset - 1} were dropped "
+                                                   "before they could be sent. Please ask again."}
+                return
+            if idle and not batch:
+                yield None, None
+                continue
+            for n, event in enumerate(batch):
+                yield i + n, event
+            i += len(batch)
+            if finished and not batch:
+                return
+
+
+class SingleFlight:
+    def __init__(self, replay_ttl=30.0, max_events=5000, resume_ttl=60.0):
+        self.replay_ttl = replay_ttl
+        self.resume_ttl = resume_ttl
+        self.max_events = max_events
+        self.flights = {}
+        self.runs = {}
+        self.stats = {"executions": 0, "executions_saved": 0, "resumes": 0, "resumes_missed": 0}
+
+    def joinable(self, flight):
+        if flight.overflowed:
+            return False
+        return not flight.done or time.monotonic() - flight.finished_at < self.replay_ttl
+
+    def join_or_start(self, key, start):
+        """
+        Return (flight, is_leader). `start` is called only when no joinable
+        flight exists for `key`; it must return (async_iterable, context).
+        """
+        self._expire()
+        flight = self.flights.get(key)
+        if flight is not None and self.joinable(flight):
+            self.stats["executions_saved"] += 1
+            return flight, False
+        flight = self.start(start)
+        flight.key = key
+        self.flights[key] = flight
+        return flight, True
+
+    def start(self, start):
+        """Start a run that is never shared but can be resumed by id; `start` is as for join_or_start."""
+        self._expire()
+        flight = Flight(None, self.max_events)
+        events, flight.context = start()
+        self.runs[flight.id] = flight
+        self.stats["executions"] += 1
+        flight.task = asyncio.create_task(self._run(flight, events))
+        return flight
+
+    def resume(self, run_id, seq):
+        """The run with this id if events from number `seq` on can still be replayed, else None."""
+        self._expire()
+        flight = self.runs.get(run_id)
+        if flight is None or not flight.replayable(seq):
+            self.stats["resumes_missed"] += 1
+            return None
+        self.stats["resumes"] += 1
+        return flight
+
+    async def _run(self, flight, events):
+        try:
+            async for event in events:
+                await flight.publish(event)
+        except Exception as e:
+            await flight.publish({"type": "error", "data": str(e)})
+        finally:
+            await flight.close()
+
+    def _expire(self):
+        for key, flight in list(self.flights.items()):
+            if not self.joinable(flight) and self.flights.get(key) is flight:
+                del self.flights[key]
+        now = time.monotonic()
+        for run_id, flight in list(self.runs.items()):
+            if flight.done and now - flight.finished_at >= self.resume_ttl:
+                del self.runs[run_id]
+
+    def snapshot(self):
+        return {**self.stats, "active": len(self.flights), "resumable": len(self.runs)}
@@ -0,0 +1,132 @@
+"""
+Local stub of every upstream the agent talks to, for offline integration tests.
+
+Serves Tavily (/search), Arxiv (/api/query), Wikipedia (/w/api.php) and an
+OpenAI-compatible chat endpoint (Groq's /openai/v1/chat/completions and the
+plain /v1/chat/completions) with configurable latency.
+
+    STUB_LATENCY=0.2 uvicorn stub_server:app --port 9000
+    TAVILY_BASE_URL=http://127.0.0.1:9000 ARXIV_BASE_URL=http://127.0.0.1:9000 \\
+    WIKIPEDIA_BASE_URL=http://127.0.0.1:9000 GROQ_BASE_URL=http://127.0.0.1:9000 \\
+    uvicorn langgraph_agent:app
+
+Latency and error rate can be changed while running, e.g. to degrade one
+backend of the LLM pool mid-benchmark:
+
+    curl -X POST 127.0.0.1:9000/stub/config -d '{"latency": 2.0, "error_rate": 0.5}'
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+#latency applies to every request; chat completions fail error_rate of requests with 429 (for failover tests)
+config = {
+    "latency": float(os.environ.get("STUB_LATENCY", "0.05")),
+    "error_rate": float(os.environ.get("STUB_ERROR_RATE", "0")),
+}
+
+app = FastAPI()
+counters = {"requests": 0}
+
+
+@app.middleware("http")
+async def count_requests(request, call_next):
+    counters["requests"] += 1
+    if not request.url.path.startswith("/stub/"):
+        await asyncio.sleep(config["latency"])
+    return await call_next(request)
+
+
+@app.get("/stub/stats")
+def stub_stats():
+    return counters
+
+
+@app.post("/stub/config")
+async def stub_config(request: Request):
+    body = await request.json()
+    config.update({k: float(v) for k, v in body.items() if k in config})
+    return config
+
+
+@app.post("/search")
+async def tavily(request: Request):
+    body = await request.json()
+    q = body.get("query", "")
+    return {"results": [
+        {"title": f"{q} — result {i}", "url": f"https://example.com/{i}/{q.replace(' ', '-')}",
+         "content": f"Stub web result {i} about {q}.", "score": 1 - i / 10}
+        for i in range(body.get("max_results", 5))
+    ]}
+
+
+@app.get("/api/query")
+def arxiv(search_query: str = "", max_results: int = 2):
+    q = search_query.removeprefix("all:")
+    entries = "".join(
+        f"<entry><id>http://arxiv.org/abs/0000.{i:05d}</id><updated>2024-01-0{i + 1}T00:00:00Z</updated>"
+        f"<title>{q} paper {i}</title><summary>Stub abstract {i} on {q}.</summary>"
+        f"<author><name>Author {i}</name></author></entry>"
+        for i in range(max_results)
+    )
+    return Response(f'<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>', media_type="application/atom+xml")
+
+
+@app.get("/w/api.php")
+def wikipedia(request: Request):
+    p = request.query_params
+    if p.get("list") == "search":
+        q = p.get("srsearch", "")
+        return {"query": {"search": [{"title": f"{q} {i}"} for i in range(int(p.get("srlimit", 2)))]}}
+    titles = p.get("titles", "").split("|")
+    return {"query": {"pages": {str(i): {"title": t, "extract": f"Stub summary of {t}."} for i, t in enumerate(titles)}}}
+
+
+def _chat_reply(body):
+    """Call one tool on the first step of a turn, answer after tool results."""
+    messages = body.get("messages", [])
+    last = messages[-1] if messages else {}
+    if body.get("tools") and last.get("role") == "user":
+        return None, [{"id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                       "function": {"name": body["tools"][0]["function"]["name"],
+                                    "arguments": json.dumps({"query": str(last.get("content", ""))[:80]})}}]
+    return "This is a stub answer based on the gathered results.", None
+
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat(request: Request):
+    body = await request.json()
+    if random.random() < config["error_rate"]:
+        return JSONResponse({"error": {"message": "stub rate limit"}}, status_code=429)
+    content, tool_calls = _chat_reply(body)
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex[:8]}", "created": int(time.time()), "model": body.get("model", "stub")}
+    usage = {"prompt_tokens": sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4,
+             "completion_tokens": 12, "total_tokens": 0}
+
+    if not body.get("stream"):
+        message = {"role": "assistant", "content": content, "tool_calls": tool_calls}
+        return {**base, "object": "chat.completion", "usage": usage,
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"}]}
+
+    async def sse():
+        def chunk(delta, finish=None, **extra):
+            return "data: " + json.dumps({**base, "object": "chat.completion.chunk", **extra,
+                                          "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}) + "\n\n"
+        if tool_calls:
+            yield chunk({"role": "assistant", "tool_calls": [{**tool_calls[0], "index": 0}]})
+            yield chunk({}, "tool_calls", x_groq={"usage": usage}, usage=usage)
+        else:
+            for word in content.split(" "):
+                yield chunk({"role": "assistant", "content": word + " "})
+                await asyncio.sleep(0.005)
+            yield chunk({}, "stop", x_groq={"usage": usage}, usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(sse(), media_type="text/event-stream")
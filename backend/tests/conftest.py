@@ -0,0 +1,55 @@
+"""
+Shared test setup: the backend is imported once with isolated state files
+(see bench.load_app). Each test installs its own fake LLM and tools.
+
+    cd backend && python -m pytest -q tests
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import FakeTool, TOOL_NAMES, load_app  # noqa: E402
+
+app = load_app(COALESCE_QUERIES=1, SPECULATIVE_PREFETCH=0)
+import langgraph_agent  # noqa: E402
+
+
+def fake_tools(latency=0.0):
+    return {name: FakeTool(name, latency, 400) for name in TOOL_NAMES}
+
+
+def sse_events(text):
+    """The JSON events of an /ask_stream response body."""
+    return [json.loads(line[5:]) for line in text.splitlines() if line.startswith("data:")]
+
+
+def replay_answer(events):
+    """The answer a client builds from answer_delta events, honouring answer_reset."""
+    text = ""
+    for e in events:
+        if e["type"] == "answer_reset":
+            text = ""
+        elif e["type"] == "answer_delta":
+            text += e["data"]
+    return text
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def ask(client):
+    def ask(body):
+        r = client.post("/ask_stream", json=body, headers={"X-Api-Key": os.environ["NEXUS_API_KEY"]})
+        r.raise_for_status()
+        return sse_events(r.text)
+    return ask
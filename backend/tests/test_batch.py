@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar
+
+import pytest
+
+from bench import FakeChatModel
+from conftest import fake_tools, langgraph_agent
+
+HEADERS = {"X-Api-Key": os.environ["NEXUS_API_KEY"]}
+
+
+@pytest.mark.parametrize("body, detail", [
+    ({"queries": [{"id": "q1"}]}, "Query 0 has no query text."),
+    ({"queries": ["ok", {"query": 7}]}, "Query 1 has no query text."),
+    ({"queries": "what is bm25"}, "queries must be a list."),
+    ({"queries": []}, "No queries given."),
+    ({"queries": ["what is bm25"], "concurrency": "many"}, "concurrency must be an integer."),
+    ({"queries": ["what is bm25"], "concurrency": None}, "concurrency must be an integer."),
+])
+def test_bad_batch_is_rejected_with_400(client, body, detail):
+    r = client.post("/ask_batch", json=body, headers=HEADERS)
+    assert r.status_code == 400
+    assert r.json()["detail"] == detail
+
+
+def test_batch_answers_every_query(client):
+    langgraph_agent.use_backends(llm=FakeChatModel(tool_rounds=0, first_token_latency=0, token_interval=0),
+                                 tool_impls=fake_tools())
+    r = client.post("/ask_batch", json={"queries": ["first", {"id": "b", "query": "second"}], "concurrency": "2"},
+                    headers=HEADERS)
+    assert r.status_code == 200
+    events = [json.loads(line) for line in r.text.splitlines() if line]
+    assert {e["id"] for e in events if e["type"] == "answer"} == {"0", "b"}
+    assert events[-1]["type"] == "batch_done"
+
+
+class CountingModel(FakeChatModel):
+    """Answers directly, recording how many calls run at once."""
+
+    running: ClassVar[int] = 0
+    peak: ClassVar[int] = 0
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        cls = type(self)
+        cls.running += 1
+        cls.peak = max(cls.peak, cls.running)
+        try:
+            await asyncio.sleep(0.05)
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                yield chunk
+        finally:
+            cls.running -= 1
+
+
+def test_batches_of_one_key_share_its_concurrency(client, monkeypatch):
+    monkeypatch.setattr(langgraph_agent, "BATCH_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(langgraph_agent, "batch_slots", defaultdict(lambda: asyncio.Semaphore(2)))
+    langgraph_agent.use_backends(llm=CountingModel(tool_rounds=0, first_token_latency=0, token_interval=0),
+                                 tool_impls=fake_tools())
+
+    def batch(n):
+        body = {"queries": [f"batch {n} question {i}" for i in range(4)], "concurrency": 2}
+        return client.post("/ask_batch", json=body, headers=HEADERS)
+
+    with ThreadPoolExecutor(3) as pool:
+        responses = list(pool.map(batch, range(3)))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert sum(line.count('"type": "answer"') for r in responses for line in r.text.splitlines()) == 12
+    assert CountingModel.peak == 2
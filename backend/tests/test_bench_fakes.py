@@ -0,0 +1,32 @@
+import asyncio
+
+from langchain_core.messages import HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+from bench import FakeChatModel
+
+
+@tool
+def wikipedia(query: str) -> str:
+    """Look a topic up."""
+    return query
+
+
+def test_sync_and_async_paths_give_the_same_reply():
+    llm = FakeChatModel(first_token_latency=0, token_interval=0, answer_tokens=3).bind_tools([wikipedia])
+    messages = [HumanMessage(content="what is bm25")]
+
+    call = llm.invoke(messages)
+    assert call.tool_calls == asyncio.run(llm.ainvoke(messages)).tool_calls
+    assert [c["name"] for c in call.tool_calls] == ["wikipedia", "wikipedia"]
+
+    messages += [call] + [ToolMessage(content="result", tool_call_id=c["id"]) for c in call.tool_calls]
+    answer = llm.invoke(messages)
+    assert answer.content == asyncio.run(llm.ainvoke(messages)).content == "token0 token1 token2 "
+    assert answer.usage_metadata["output_tokens"] == 3
+    assert "".join(chunk.content for chunk in llm.stream(messages)) == answer.content
+
+
+def test_sync_path_skips_the_simulated_latency():
+    llm = FakeChatModel(tool_rounds=0, first_token_latency=5, token_interval=5, answer_tokens=2)
+    assert llm.invoke([HumanMessage(content="hi")]).content == "token0 token1 "
@@ -0,0 +1,24 @@
+from bench import FakeChatModel
+from conftest import fake_tools, langgraph_agent
+
+
+def test_follower_thread_is_seeded_before_stats(client):
+    langgraph_agent.use_backends(llm=FakeChatModel(tool_rounds=0, first_token_latency=0.2, token_interval=0),
+                                 tool_impls=fake_tools())
+    budget = langgraph_agent.budget_policy.for_request(None)
+
+    async def ask_twice_and_hang_up_at_stats():
+        flight, _ = langgraph_agent.join_shared_run("what is a coalesced question", False, budget)
+        joined, leader = langgraph_agent.join_shared_run("what is a coalesced question", False, budget)
+        assert joined is flight and not leader
+        follower = langgraph_agent.follow_shared_run(joined)
+        async for _, e in follower:
+            if e and e["type"] == "stats":
+                break
+        # The client disconnects as soon as it has the stats; nothing after them runs
+        await follower.aclose()
+        config = {"configurable": {"thread_id": e["data"]["thread_id"]}}
+        return (await langgraph_agent.graph.aget_state(config)).values.get("messages", [])
+
+    messages = client.portal.call(ask_twice_and_hang_up_at_stats)
+    assert [m.type for m in messages] == ["human", "ai"]
@@ -0,0 +1,28 @@
+import pytest
+
+import evidence
+
+
+def item(url, title="Alan Turing", snippet="mathematician and computer scientist"):
+    return {"url": url, "title": title, "snippet": snippet}
+
+
+def test_canonical_url_merges_mirrors_of_the_same_page():
+    assert evidence.canonical_url("https://en.m.wikipedia.org/wiki/Alan%20Turing#Life") == \
+        evidence.canonical_url("http://en.wikipedia.org/wiki/Alan_Turing/?utm_source=feed")
+    assert evidence.canonical_url("http://arxiv.org/pdf/2101.00001v2") == "arxiv.org/abs/2101.00001"
+
+
+@pytest.mark.parametrize("url", ["http://[broken/page", "https://]example.org/x"])
+def test_malformed_url_falls_back_to_title_key(url):
+    with pytest.raises(ValueError):
+        evidence.canonical_url(url)
+    assert evidence.evidence_key(item(url)) == "title:alan turing"
+    assert evidence.evidence_key(item(url, title="")) == "text:mathematician and computer scientist"
+
+
+def test_select_survives_malformed_urls():
+    items = [item("http://[broken/page"), item("https://example.org/turing", title="Turing machine")]
+    kept, counts = evidence.select(items, "alan turing", set(), [], top_n=5, per_group=5, threshold=0.8)
+    assert {it["key"] for it in kept} == {"title:alan turing", "example.org/turing"}
+    assert counts["forwarded"] == 2
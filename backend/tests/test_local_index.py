@@ -0,0 +1,67 @@
+import threading
+import time
+
+from local_index import LocalIndex
+
+
+def docs(n, start=0):
+    return [{"title": f"paper {i}", "url": f"https://example.org/{i}", "text": f"quantum topic{i} body text",
+             "source": "arxiv"} for i in range(start, start + n)]
+
+
+def assert_fully_merged(index, docs_count):
+    # How merges pair up depends on timing, but none is left to do: sizes strictly shrink
+    sizes = [s.docs for s in index._segments]
+    assert sum(sizes) == docs_count and sizes == sorted(set(sizes), reverse=True)
+
+
+def test_merges_keep_segments_logarithmic_and_survive_reopen(tmp_path):
+    index = LocalIndex(str(tmp_path), flush_docs=2)
+    for doc in docs(16):
+        index.add([doc])
+    index.close()
+    assert_fully_merged(index, 16)
+    assert index.snapshot()["merges"] == 8 - len(index._segments)
+
+    reopened = LocalIndex(str(tmp_path))
+    assert len(reopened) == 16
+    assert reopened.search("topic11")[0]["url"] == "https://example.org/11"
+    assert sorted(p.stem for p in tmp_path.iterdir() if p.suffix == ".post") == sorted(s.name for s in index._segments)
+    reopened.close()
+
+
+class BlockedMergeIndex(LocalIndex):
+    release = threading.Event()
+
+    def _merge(self, older, newer, name):
+        self.release.wait(10)
+        return super()._merge(older, newer, name)
+
+
+def test_search_and_add_do_not_wait_for_merges(tmp_path):
+    index = BlockedMergeIndex(str(tmp_path), flush_docs=2)
+    index.add(docs(2))
+    index.add(docs(2, start=2))
+    assert index.snapshot()["merging"]
+
+    start = time.perf_counter()
+    assert index.search("topic1")[0]["url"] == "https://example.org/1"
+    assert index.add(docs(2, start=4)) == 2
+    assert time.perf_counter() - start < 1
+
+    index.release.set()
+    index.close()
+    assert_fully_merged(index, 6)
+    assert index.search("topic5")[0]["url"] == "https://example.org/5"
+
+
+def test_second_opener_is_read_only(tmp_path):
+    writer = LocalIndex(str(tmp_path), flush_docs=2)
+    writer.add(docs(4))
+    reader = LocalIndex(str(tmp_path))
+    assert reader.read_only
+    assert reader.add(docs(2, start=4)) == 0
+    assert reader.search("topic3")[0]["url"] == "https://example.org/3"
+    reader.close()
+    writer.close()
+    assert not LocalIndex(str(tmp_path)).read_only
@@ -0,0 +1,63 @@
+import asyncio
+
+from single_flight import Flight
+
+
+async def collect(flight, start=0):
+    return [(seq, e) async for seq, e in flight.subscribe(start)]
+
+
+def test_subscriber_that_falls_behind_the_buffer_gets_an_error_not_a_gap():
+    async def run():
+        flight = Flight(None, max_events=5)
+        for n in range(12):
+            await flight.publish({"type": "answer_delta", "data": str(n)})
+        await flight.close()
+        return await collect(flight)
+
+    events = asyncio.run(run())
+    assert len(events) == 1
+    seq, e = events[0]
+    assert seq == 0 and e["type"] == "error" and "events 0-6" in e["data"]
+
+
+def test_slow_reader_is_cut_off_at_the_first_evicted_event():
+    async def run():
+        flight = Flight(None, max_events=5)
+        received = []
+        subscription = flight.subscribe()
+        for n in range(3):
+            await flight.publish({"type": "answer_delta", "data": str(n)})
+        received.append(await subscription.__anext__())
+        # The reader stalls while the run keeps publishing past the buffer
+        for n in range(3, 12):
+            await flight.publish({"type": "answer_delta", "data": str(n)})
+        await flight.close()
+        received += [item async for item in subscription]
+        return received
+
+    received = asyncio.run(run())
+    # Events read before the stall still arrive; the first evicted one ends the stream
+    assert [seq for seq, _ in received] == [0, 1, 2, 3]
+    assert [e["data"] for _, e in received[:3]] == ["0", "1", "2"]
+    assert received[-1][1]["type"] == "error" and "events 3-6" in received[-1][1]["data"]
+
+
+def test_reader_keeping_up_gets_every_event_in_order():
+    async def run():
+        flight = Flight(None, max_events=5)
+
+        async def produce():
+            for n in range(50):
+                await flight.publish({"type": "answer_delta", "data": str(n)})
+                await asyncio.sleep(0)
+            await flight.close()
+
+        reader = asyncio.create_task(collect(flight))
+        await asyncio.sleep(0)
+        await produce()
+        return await reader
+
+    events = asyncio.run(run())
+    assert [seq for seq, _ in events] == list(range(50))
+    assert all(e["type"] == "answer_delta" for _, e in events)
@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_writes_nothing_to_the_working_directory(tmp_path):
+    env = {k: v for k, v in os.environ.items()
+           if k not in ("TOOL_CACHE_PATH", "CHECKPOINT_PATH", "LOCAL_INDEX_PATH")}
+    env["PYTHONPATH"] = BACKEND
+    subprocess.run([sys.executable, "-c", "import langgraph_agent"], cwd=tmp_path, env=env, check=True,
+                   timeout=120)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,85 @@
+import asyncio
+import os
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+from bench import FakeChatModel
+from conftest import fake_tools, langgraph_agent, replay_answer
+from model_pool import Backend, ModelPool
+
+HEADERS = {"X-Api-Key": os.environ["NEXUS_API_KEY"]}
+
+
+class DroppingModel(FakeChatModel):
+    """Streams a few tokens, then fails like a backend dropping the connection mid-answer."""
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for i in range(3):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"PARTIAL{i} "))
+        raise ConnectionError("backend dropped the stream")
+
+
+def test_failover_after_partial_output_resets_streamed_answer(ask):
+    pool = ModelPool([
+        Backend("dropping", DroppingModel),
+        Backend("healthy", lambda: FakeChatModel(first_token_latency=0, token_interval=0, answer_tokens=5)),
+    ])
+    langgraph_agent.use_backends(llm=pool, tool_impls=fake_tools())
+
+    events = ask({"query": "hi"})
+
+    answer = next(e["data"] for e in events if e["type"] == "answer")
+    assert "PARTIAL" not in answer
+    assert [e["type"] for e in events].count("answer_reset") == 1
+    assert replay_answer(events) == answer
+    assert pool.snapshot()["failovers"] == 1
+
+
+class SlowUnlessForcedModel(FakeChatModel):
+    """Streams slowly enough to hit the deadline, except when asked for the forced answer."""
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if messages[-1].content == langgraph_agent.FORCED_ANSWER_PROMPT:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="forced answer"))
+            return
+        for i in range(100):
+            await asyncio.sleep(0.05)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"PARTIAL{i} "))
+
+
+def test_deadline_cut_mid_stream_resets_streamed_answer(ask):
+    langgraph_agent.use_backends(llm=SlowUnlessForcedModel(tool_rounds=0), tool_impls=fake_tools())
+
+    events = ask({"query": "hi", "deadline_s": 1})
+
+    answer = next(e["data"] for e in events if e["type"] == "answer")
+    assert answer == "forced answer"
+    assert any(e["type"] == "answer_delta" and "PARTIAL" in e["data"] for e in events)
+    assert replay_answer(events) == answer
+
+
+@pytest.mark.parametrize("value", ["false", "0", 0, None])
+def test_stream_tokens_must_be_a_boolean(client, value):
+    for path in ("/ask_stream", "/ask_batch"):
+        r = client.post(path, json={"query": "hi", "queries": ["hi"], "stream_tokens": value}, headers=HEADERS)
+        assert r.status_code == 400
+        assert r.json()["detail"] == "stream_tokens must be true or false."
+
+
+def test_stream_tokens_false_sends_no_deltas(ask):
+    langgraph_agent.use_backends(llm=FakeChatModel(tool_rounds=0, first_token_latency=0, token_interval=0),
+                                 tool_impls=fake_tools())
+    events = ask({"query": "hi", "stream_tokens": False})
+    assert not any(e["type"] == "answer_delta" for e in events)
+    assert any(e["type"] == "answer" for e in events)
+
+
+@pytest.mark.parametrize("value", ["false", "true", 1])
+def test_speculative_must_be_a_boolean(client, value):
+    before = langgraph_agent.prefetch_stats.snapshot()
+    r = client.post("/ask_stream", json={"query": "hi", "speculative": value}, headers=HEADERS)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "speculative must be true or false."
+    assert langgraph_agent.prefetch_stats.snapshot() == before
@@ -0,0 +1,32 @@
+import sqlite3
+
+from tool_cache import ToolCache
+
+
+def rows(path):
+    with sqlite3.connect(path) as db:
+        return {key for (key,) in db.execute("SELECT key FROM tool_cache")}
+
+
+def test_expired_rows_are_purged_on_open(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ToolCache(path, ttls={"tavily": -1, "arxiv": 3600})
+    cache.set("stale", "tavily", "old result")
+    cache.set("fresh", "arxiv", "paper")
+    assert rows(path) == {"stale", "fresh"}
+
+    reopened = ToolCache(path)
+    assert rows(path) == {"fresh"}
+    assert reopened.snapshot()["purged"] == 1
+    assert reopened.get("fresh") == (True, "paper")
+
+
+def test_expired_rows_are_purged_every_n_stores(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ToolCache(path, ttls={"tavily": -1, "arxiv": 3600}, purge_every=3)
+    cache.set("stale1", "tavily", "a")
+    cache.set("stale2", "tavily", "b")
+    assert rows(path) == {"stale1", "stale2"}
+    cache.set("fresh", "arxiv", "c")
+    assert rows(path) == {"fresh"}
+    assert cache.snapshot()["purged"] == 2
@@ -0,0 +1,132 @@
+"""
+Compaction of tool output before it is appended to the conversation.
+
+Raw tool results (Tavily JSON in particular) are parsed into items with a
+title, URL and snippet, deduplicated against what the current turn has
+already seen, cut down to the top-k items and truncated so the whole turn
+stays inside a token budget.
+"""
+import json
+import math
+import re
+
+CHARS_PER_TOKEN = 4
+
+
+def approx_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _field(block, name):
+    m = re.search(rf"^{name}:\s*(.+)$", block, flags=re.MULTILINE)
+    return m.group(1).strip() if m else None
+
+
+def _after_field(block, name):
+    m = re.search(rf"^{name}:\s*", block, flags=re.MULTILINE)
+    return block[m.end():].strip() if m else block.strip()
+
+
+def parse_items(tool_name, content):
+    """Split a raw tool result into [{"title", "url", "snippet"}]; unknown shapes become one untitled item."""
+    if isinstance(content, str):
+        try:
+            decoded = json.loads(content)
+        except ValueError:
+            decoded = None
+        if isinstance(decoded, list):
+            content = decoded
+
+    if isinstance(content, list):
+        items = []
+        for r in content:
+            if isinstance(r, dict):
+                items.append({
+                    "title": r.get("title") or "",
+                    "url": r.get("url") or "",
+                    "snippet": str(r.get("content") or r.get("snippet") or ""),
+                })
+            else:
+                items.append({"title": "", "url": "", "snippet": str(r)})
+        return items
+
+    text = str(content)
+    blocks = [b for b in re.split(r"\n\s*\n(?=(?:Published|Page):)", text) if b.strip()]
+    items = []
+    for block in blocks:
+        if "arxiv" in tool_name and _field(block, "Title"):
+            items.append({"title": _field(block, "Title"), "url": "", "snippet": _after_field(block, "Summary")})
+        elif "wiki" in tool_name and _field(block, "Page"):
+            title = _field(block, "Page")
+            items.append({
+                "title": title,
+                "url": "https://en.wikipedia.org/wiki/" + title.replace(" ", "_"),
+                "snippet": _after_field(block, "Summary"),
+            })
+        else:
+            items.append({"title": "", "url": "", "snippet": block.strip()})
+    return items
+
+
+def item_key(item):
+    if item["url"]:
+        return item["url"].rstrip("/").lower()
+    if item["title"]:
+        return "title:" + item["title"].lower()
+    return "text:" + " ".join(item["snippet"].lower().split())[:200]
+
+
+def truncate(text, max_chars):
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut + " …"
+
+
+def render_items(items):
+    lines = []
+    for i, item in enumerate(items, 1):
+        lines.append(f"[{i}] {item['title'] or 'Result'}")
+        if item["url"]:
+            lines.append(f"URL: {item['url']}")
+        if item["snippet"]:
+            lines.append(item["snippet"])
+        lines.append("")
+    return "\n".join(lines).strip()
+
+
+def compact(tool_name, content, seen, max_tokens, top_k=3):
+    """
+    Compact one tool result. `seen` is the set of item keys already in the
+    current turn and is updated in place. Returns (text, items, raw_tokens)
+    where items are the new, truncated results kept in the text.
+    """
+    raw = content if isinstance(content, str) else json.dumps(content, default=str)
+    raw_tokens = approx_tokens(raw)
+    items = []
+    for item in parse_items(tool_name, content):
+        key = item_key(item)
+        if key in seen:
+            continue
+        seen.add(key)
+        items.append(item)
+        if len(items) >= top_k:
+            break
+
+    if not items:
+        return "No new results (already retrieved earlier in this turn).", [], raw_tokens
+    return fit(items, raw, max_tokens), items, raw_tokens
+
+
+def fit(items, raw, max_tokens):
+    """Truncate the items' snippets in place so they share max_tokens, and render them (or raw, if shorter)."""
+    overhead = sum(len(it["title"]) + len(it["url"]) + 16 for it in items)
+    per_item = max(80, (max_tokens * CHARS_PER_TOKEN - overhead) // len(items))
+    for it in items:
+        it["snippet"] = truncate(it["snippet"], per_item)
+    text = render_items(items)
+    if approx_tokens(text) >= approx_tokens(raw):
+        # Never make a small payload bigger by reformatting it
+        text = raw
+    return text
@@ -0,0 +1,122 @@
+"""
+Two-tier cache for tool results.
+
+A bounded in-memory LRU sits in front of an on-disk SQLite store (WAL mode),
+so results survive restarts and are shared between workers on one host.
+Entries are keyed on tool name plus normalized arguments and expire after a
+per-tool TTL. Expired rows are deleted when the cache is opened and every
+`purge_every` stores, so the file does not grow with dead entries.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_args(args):
+    """Lower-case and collapse whitespace in string arguments so trivially different queries share a key."""
+    if isinstance(args, str):
+        return " ".join(args.lower().split())
+    if isinstance(args, dict):
+        return {k: normalize_args(v) for k, v in sorted(args.items())}
+    if isinstance(args, (list, tuple)):
+        return [normalize_args(v) for v in args]
+    return args
+
+
+def cache_key(tool_name, args):
+    payload = json.dumps([tool_name, normalize_args(args)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ToolCache:
+    def __init__(self, path="tool_cache.sqlite3", max_memory_entries=1024, ttls=None, default_ttl=3600,
+                 purge_every=500):
+        self.max_memory_entries = max_memory_entries
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.purge_every = purge_every
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "purged": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache ("
+            "key TEXT PRIMARY KEY, tool TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS tool_cache_expires_at ON tool_cache (expires_at)")
+        self.purge_expired()
+
+    def ttl_for(self, tool_name):
+        return self.ttls.get(tool_name, self.default_ttl)
+
+    def get_memory(self, key):
+        """Look up the in-memory tier only. Returns (hit, value)."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._memory[key]
+                return False, None
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return True, value
+
+    def get(self, key):
+        """Look up both tiers, promoting disk hits into memory. Returns (hit, value)."""
+        hit, value = self.get_memory(key)
+        if hit:
+            return hit, value
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM tool_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < time.time():
+                self.stats["misses"] += 1
+                return False, None
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self.stats["disk_hits"] += 1
+            return True, value
+
+    def set(self, key, tool_name, value):
+        expires_at = time.time() + self.ttl_for(tool_name)
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._db.execute(
+                "INSERT OR REPLACE INTO tool_cache (key, tool, value, expires_at) VALUES (?, ?, ?, ?)",
+                (key, tool_name, json.dumps(value, default=str), expires_at),
+            )
+            self.stats["stores"] += 1
+            if self.purge_every and self.stats["stores"] % self.purge_every == 0:
+                self._purge()
+
+    def purge_expired(self):
+        """Delete expired rows from disk; returns how many."""
+        with self._lock:
+            return self._purge()
+
+    def _purge(self):
+        deleted = self._db.execute("DELETE FROM tool_cache WHERE expires_at < ?", (time.time(),)).rowcount
+        self.stats["purged"] += deleted
+        return deleted
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -1,10 +1,15 @@
 import streamlit as st
-import requests
+import html
+import os
 import re
-import json
 import time
+import urllib.parse
+from collections import deque
 import streamlit.components.v1 as _components
 
+from backend_client import BackendClient, EventStream
+from render import ChatHistory, MarkdownStream, SourceSet, build_panel, to_html
+
 # ─────────────────────────────────────────────
 #  PAGE CONFIG
 # ─────────────────────────────────────────────
@@ -18,9 +23,6 @@ st.set_page_config(
 # ─────────────────────────────────────────────
 #  HELPERS
 # ─────────────────────────────────────────────
-def extract_urls(text):
-    return list(set(re.findall(r"https?://[^\s\"'<>)]+", text)))
-
 def tool_class(name):
     n = name.lower()
     if "arxiv"  in n: return "arxiv"
@@ -33,8 +35,31 @@ def tool_icon(name):
     if "arxiv"  in n: return "📄"
     if "wiki"   in n: return "📖"
     if "tavily" in n: return "🌐"
+    if "local"  in n: return "🗂"
     return "🔧"
 
+def source_card(i, src):
+    title = html.escape(src.get("title", ""))
+    url = src.get("url") or ""
+    try:
+        parts = urllib.parse.urlsplit(url)
+    except ValueError:
+        parts = None
+    # Tool results are untrusted: only web links, with everything escaped, make it into the page
+    if parts and parts.scheme.lower() in ("http", "https") and parts.netloc:
+        host = re.sub(r"^www\.", "", parts.netloc)
+        label = (f'<a href="{html.escape(url, quote=True)}" target="_blank" rel="noopener noreferrer" '
+                 f'class="source-link" title="{title}">{html.escape(host)}</a>')
+    else:
+        label = f'<span class="source-link">{title}</span>'
+    return (f'<div class="source-card"><div class="source-num">SRC {i:02d} {tool_icon(src.get("tool", ""))}</div>'
+            f'{label}</div>')
+
+@st.cache_resource
+def get_client():
+    """One pooled backend client shared by all sessions."""
+    return BackendClient()
+
 def now_stamp():
     t = time.localtime()
     return f"{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
@@ -63,82 +88,23 @@ def scroll_to_bottom():
         scrolling=False,
     )
 
-def to_html(text):
-    """Convert markdown to HTML using stdlib only — no external packages."""
-    import html as _html
-    # We do NOT escape first — LLM output may have intentional < > in code
-    t = text
-
-    # Fenced code blocks ```lang\n...\n```
-    import re as _re
-    t = _re.sub(r'```[\w]*\n(.*?)```', lambda m: '<pre><code>' + _html.escape(m.group(1)) + '</code></pre>', t, flags=_re.DOTALL)
-
-    # Inline code `code`
-    t = _re.sub(r'`([^`]+)`', lambda m: '<code>' + _html.escape(m.group(1)) + '</code>', t)
-
-    # Headers ### ## #
-    t = _re.sub(r'^### (.+)$', r'<h3>\1</h3>', t, flags=_re.MULTILINE)
-    t = _re.sub(r'^## (.+)$',  r'<h2>\1</h2>', t, flags=_re.MULTILINE)
-    t = _re.sub(r'^# (.+)$',   r'<h1>\1</h1>', t, flags=_re.MULTILINE)
-
-    # Bold **text** and __text__
-    t = _re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', t)
-    t = _re.sub(r'__(.+?)__',          r'<strong>\1</strong>', t)
-
-    # Italic *text* and _text_
-    t = _re.sub(r'\*([^\*\n]+?)\*', r'<em>\1</em>', t)
-    t = _re.sub(r'(?<![_])_([^_\n]+?)_(?![_])', r'<em>\1</em>', t)
-
-    # Links [text](url)
-    t = _re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<a href="\2" target="_blank">\1</a>', t)
-
-    # Process line by line for lists and paragraphs
-    lines = t.split('\n')
-    result = []
-    in_ul = False
-    in_ol = False
-
-    for line in lines:
-        # Unordered list: - item or * item
-        ul_match = _re.match(r'^[\s]*[-*•] (.+)$', line)
-        ol_match = _re.match(r'^[\s]*(\d+)\. (.+)$', line)
-
-        if ul_match:
-            if in_ol:
-                result.append('</ol>'); in_ol = False
-            if not in_ul:
-                result.append('<ul>'); in_ul = True
-            result.append(f'<li>{ul_match.group(1)}</li>')
-        elif ol_match:
-            if in_ul:
-                result.append('</ul>'); in_ul = False
-            if not in_ol:
-                result.append('<ol>'); in_ol = True
-            result.append(f'<li>{ol_match.group(2)}</li>')
-        else:
-            if in_ul:
-                result.append('</ul>'); in_ul = False
-            if in_ol:
-                result.append('</ol>'); in_ol = False
-
-            stripped = line.strip()
-            if stripped == '':
-                result.append('<br>')
-            elif stripped.startswith('<h') or stripped.startswith('<pre') or stripped.startswith('<ul') or stripped.startswith('<ol'):
-                result.append(stripped)
-            else:
-                result.append(f'<p>{stripped}</p>')
-
-    if in_ul: result.append('</ul>')
-    if in_ol: result.append('</ol>')
-
-    return '\n'.join(result)
-
 # ─────────────────────────────────────────────
 #  SESSION STATE
 # ─────────────────────────────────────────────
-for key, val in [("chat", []), ("sources_all", []), ("activity", []),
-                 ("query_count", 0), ("tool_count", 0),
+# Caps keep a long research day's session state bounded
+CHAT_MAX_MESSAGES = int(os.environ.get("CHAT_MAX_MESSAGES", "500"))
+CHAT_PAGE_SIZE = int(os.environ.get("CHAT_PAGE_SIZE", "40"))
+MAX_SOURCES = int(os.environ.get("MAX_SOURCES", "500"))
+ACTIVITY_SHOWN = 8
+
+def fresh_session():
+    return {
+        "chat": ChatHistory(CHAT_MAX_MESSAGES), "chat_visible": CHAT_PAGE_SIZE,
+        "sources_all": SourceSet(MAX_SOURCES), "activity": deque(maxlen=ACTIVITY_SHOWN),
+        "query_count": 0, "tool_count": 0, "thread_id": None,
+    }
+
+for key, val in [*fresh_session().items(),
                  ("api_key", ""), ("authenticated", False)]:
     if key not in st.session_state:
         st.session_state[key] = val
@@ -631,11 +597,7 @@ if not st.session_state.authenticated:
         if st.button("⬡  AUTHENTICATE", use_container_width=True, key="auth_btn"):
             if key_input.strip():
                 try:
-                    resp = requests.post(
-                        "http://127.0.0.1:8000/verify-key",
-                        headers={"X-Api-Key": key_input.strip()},
-                        timeout=5
-                    )
+                    resp = get_client().verify_key(key_input.strip())
                     if resp.status_code == 200:
                         st.session_state.api_key = key_input.strip()
                         st.session_state.authenticated = True
@@ -676,11 +638,8 @@ with logout_col2:
     if st.button("⬡ LOGOUT", key="logout_btn", use_container_width=True):
         st.session_state.authenticated = False
         st.session_state.api_key = ""
-        st.session_state.chat = []
-        st.session_state.sources_all = []
-        st.session_state.activity = []
-        st.session_state.query_count = 0
-        st.session_state.tool_count = 0
+        for key, val in fresh_session().items():
+            st.session_state[key] = val
         st.rerun()
 
 # ─────────────────────────────────────────────
@@ -692,12 +651,7 @@ main_col, side_col = st.columns([3, 1], gap="small")
 with side_col:
     src_html = ""
     if st.session_state.sources_all:
-        items = "".join(
-            f'<div class="source-card"><div class="source-num">SRC {i:02d}</div>'
-            f'<a href="{lnk}" target="_blank" class="source-link">'
-            f'{re.sub(r"https?://(www.)?","",lnk).split("/")[0]}</a></div>'
-            for i, lnk in enumerate(st.session_state.sources_all[:12], 1)
-        )
+        items = "".join(source_card(i, src) for i, src in enumerate(st.session_state.sources_all.first(12), 1))
         src_html = f'<div class="side-title" style="margin-top:12px;">⬡ SOURCES</div>{items}'
 
     act_html = ""
@@ -705,7 +659,7 @@ with side_col:
         rows = "".join(
             f'<div class="activity-item">'
             f'<span class="activity-time">{ts}</span><span>{lbl}</span></div>'
-            for ts, lbl in reversed(st.session_state.activity[-8:])
+            for ts, lbl in reversed(st.session_state.activity)
         )
         act_html = f'<div class="side-title" style="margin-top:14px;">⬡ ACTIVITY</div>{rows}'
 
@@ -731,35 +685,18 @@ with side_col:
     </div>
     """, unsafe_allow_html=True)
 
-# ── HELPER: build full chat HTML including any live content ──────────────────
-def build_panel(history, new_query="", live_html=""):
-    """Renders the entire chat panel as one HTML block so ordering is always correct."""
-    if not history and not new_query:
-        body = """
-        <div class="empty-state">
-          <div class="empty-hex">⬡</div>
-          <div class="empty-text">Nexus is standing by</div>
-          <div class="empty-sub">Ask anything — science, news, research</div>
-        </div>"""
-    else:
-        body = "".join(
-            f'<div class="msg-user">{msg}</div>' if role == "user"
-            else f'<div class="msg-agent">{to_html(msg)}</div>'
-            for role, msg in history
-        )
-        if new_query:
-            body += f'<div class="msg-user">{new_query}</div>'
-        if live_html:
-            body += live_html
-
-    return f'<div class="nx-panel" id="nx-chat">{body}</div>'
-
 # ── MAIN CHAT PANEL ───────────────────────────
 with main_col:
+    # Only the latest page is rendered; older messages are paged in on demand
+    hidden = st.session_state.chat.hidden(st.session_state.chat_visible)
+    if hidden and st.button(f"⬡ LOAD OLDER ({hidden})", key="load_older", use_container_width=True):
+        st.session_state.chat_visible += CHAT_PAGE_SIZE
+        st.rerun()
+
     # One single empty slot owns the ENTIRE panel — history + live updates
     panel_slot = st.empty()
     panel_slot.markdown(
-        build_panel(st.session_state.chat),
+        build_panel(st.session_state.chat, limit=st.session_state.chat_visible),
         unsafe_allow_html=True
     )
 
@@ -775,11 +712,15 @@ if query:
     tool_steps_html = ""
     streamed_answer = ""
     session_sources = []
+    last_render = 0.0
+    in_delta = False
+    answer_md = MarkdownStream()
 
     # Immediately show user message + thinking spinner
     def update_panel(live_html):
         panel_slot.markdown(
-            build_panel(st.session_state.chat, new_query=query, live_html=live_html),
+            build_panel(st.session_state.chat, new_query=query, live_html=live_html,
+                        limit=st.session_state.chat_visible),
             unsafe_allow_html=True
         )
         scroll_to_bottom()
@@ -787,25 +728,24 @@ if query:
     update_panel('<div class="nx-thinking"><div class="th-label">⬡ PROCESSING <span class="dot-pulse"></span></div></div>')
 
     try:
-        r = requests.post(
-            "http://127.0.0.1:8000/ask_stream",
-            json={"query": query},
-            headers={"X-Api-Key": st.session_state.api_key},
-            stream=True,
-            timeout=120
-        )
-
-        for line in r.iter_lines():
-            if not line:
-                continue
-            try:
-                event = json.loads(line.decode())
-            except Exception:
-                continue
-            if "type" not in event:
-                continue
-
-            if event["type"] == "tool":
+        api_key = st.session_state.api_key
+        r = get_client().ask_stream(query, api_key, thread_id=st.session_state.thread_id)
+        if r.status_code == 429:
+            raise RuntimeError(f"{r.json().get('detail', 'Too many requests')} Retry in {r.headers.get('Retry-After', '?')}s.")
+
+        # resume runs on the stream's reader thread, which has no Streamlit session: capture, don't read state
+        client = get_client()
+        stream = EventStream(r, resume=lambda last_event_id, thread_id: client.ask_stream(
+            query, api_key, thread_id=thread_id, last_event_id=last_event_id))
+        for event in stream:
+            if event["type"] == "thread":
+                # Backend keeps the conversation; follow-ups reuse this thread
+                st.session_state.thread_id = event.get("data")
+
+            elif event["type"] == "tool":
+                # Any text streamed before a tool call was not the final answer
+                streamed_answer = ""
+                in_delta = False
                 for tc in event.get("data", []):
                     name = tc.get("name", "unknown")
                     st.session_state.tool_count += 1
@@ -819,16 +759,63 @@ if query:
                 update_panel(f'<div class="nx-thinking"><div class="th-label">⬡ TOOL EXECUTION <span class="dot-pulse"></span></div>{tool_steps_html}</div>')
 
             elif event["type"] == "source":
-                session_sources.extend(extract_urls(str(event.get("data", ""))))
+                # Structured {title, url, tool, snippet}, deduplicated per request by the backend
+                session_sources.append(event.get("data", {}))
+
+            elif event["type"] == "answer_delta":
+                if not in_delta:
+                    streamed_answer, in_delta = "", True
+                    answer_md = MarkdownStream()
+                streamed_answer += event.get("data", "")
+                answer_md.feed(event.get("data", ""))
+                # Throttle reruns of the markdown renderer while tokens pour in
+                if time.perf_counter() - last_render >= 0.05:
+                    last_render = time.perf_counter()
+                    steps = f'<div class="nx-thinking">{tool_steps_html}</div>' if tool_steps_html else ""
+                    update_panel(f'{steps}<div class="msg-agent">{answer_md.html()}</div>')
+
+            elif event["type"] == "answer_reset":
+                # The backend is restarting the answer (failover or budget cut); drop the partial text
+                streamed_answer, in_delta = "", False
 
             elif event["type"] == "answer":
                 streamed_answer = event.get("data", "")
+                if in_delta:
+                    # Full message closing a streamed answer — already on screen
+                    in_delta = False
+                    continue
                 update_panel(
                     f'<div class="nx-thinking">'
                     f'<div class="th-label">⬡ WRITING RESPONSE <span class="dot-pulse"></span></div>'
                     f'{tool_steps_html}</div>'
                 )
 
+            elif event["type"] == "route":
+                route = event.get("data", {})
+                label = "direct answer" if route.get("kind") == "direct" else ", ".join(route.get("tools", []))
+                st.session_state.activity.append((now_stamp(), f"Route: {label}"))
+
+            elif event["type"] == "queue":
+                pos = event.get("data", {}).get("position")
+                update_panel(f'<div class="nx-thinking"><div class="th-label">⬡ QUEUED — POSITION {pos} <span class="dot-pulse"></span></div></div>')
+
+            elif event["type"] == "error":
+                raise RuntimeError(event.get("data", "Request failed"))
+
+            elif event["type"] == "stats":
+                stats = event.get("data", {})
+                st.session_state.activity.append(
+                    (now_stamp(), f"TTFB {stats.get('ttfb_ms')} ms · TTFT {stats.get('ttft_ms')} ms")
+                )
+                if stats.get("forced_answer"):
+                    st.session_state.activity.append((now_stamp(), f"Answered early: {stats['forced_answer']} budget"))
+                if stats.get("prefetch"):
+                    p = stats["prefetch"]
+                    st.session_state.activity.append((now_stamp(), f"Prefetch: {p['hits']}/{p['issued']} used"))
+
+        if stream.resumed:
+            st.session_state.activity.append((now_stamp(), f"Stream resumed after {stream.resumed} dropped connection(s)"))
+
         # Done — render final formatted answer
         update_panel(f'<div class="msg-agent">{to_html(streamed_answer)}</div>')
 
@@ -837,16 +824,15 @@ if query:
             build_panel(
                 st.session_state.chat,
                 new_query=query,
-                live_html=f'<div class="msg-agent" style="border-color:rgba(239,68,68,.4);color:#fca5a5;">⚠ Connection error: {e}<br><span style="font-size:11px;opacity:.55">Make sure backend is running on http://127.0.0.1:8000</span></div>'
+                limit=st.session_state.chat_visible,
+                live_html=f'<div class="msg-agent" style="border-color:rgba(239,68,68,.4);color:#fca5a5;">⚠ Connection error: {e}<br><span style="font-size:11px;opacity:.55">Make sure backend is running on {get_client().base_url}</span></div>'
             ),
             unsafe_allow_html=True
         )
         streamed_answer = f"[Error: {e}]"
 
-    st.session_state.chat.append(("user", query))
-    st.session_state.chat.append(("assistant", streamed_answer))
-    for url in session_sources:
-        if url not in st.session_state.sources_all:
-            st.session_state.sources_all.append(url)
+    st.session_state.chat.append("user", query)
+    st.session_state.chat.append("assistant", streamed_answer)
+    st.session_state.sources_all.update(session_sources)
     st.session_state.activity.append((now_stamp(), "Response delivered"))
     st.rerun()
\ No newline at end of file
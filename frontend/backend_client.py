@@ -0,0 +1,172 @@
+"""
+Pooled HTTP client for the Nexus backend.
+
+One keep-alive `requests.Session` is shared by every Streamlit session
+(see `get_client` in app.py), so queries reuse connections instead of
+opening a new one each time. Streamed responses are read and parsed on a
+background thread, which leaves the script thread free to render. If the
+connection drops mid-answer, the stream is re-opened with Last-Event-ID and
+the backend continues the same run instead of starting over.
+
+    NEXUS_BACKEND_URL=http://127.0.0.1:8000
+    BACKEND_CONNECT_TIMEOUT=3.05   seconds to establish a connection
+    BACKEND_READ_TIMEOUT=120       max seconds of silence on an open stream
+    BACKEND_RETRIES=2              retries on connection failures and 502/503/504
+    BACKEND_RESUME_ATTEMPTS=3      times a dropped stream is resumed
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_DONE = object()
+
+
+class BackendClient:
+    def __init__(self, base_url=None, connect_timeout=None, read_timeout=None, retries=None, pool_size=10):
+        env = os.environ.get
+        self.base_url = (base_url or env("NEXUS_BACKEND_URL", "http://127.0.0.1:8000")).rstrip("/")
+        self.timeout = (
+            float(connect_timeout or env("BACKEND_CONNECT_TIMEOUT", "3.05")),
+            float(read_timeout or env("BACKEND_READ_TIMEOUT", "120")),
+        )
+        retries = int(env("BACKEND_RETRIES", "2") if retries is None else retries)
+        # Never retry reads: a half-consumed stream cannot be replayed. Connection
+        # failures and gateway errors mean the backend never started the request.
+        retry = Retry(
+            total=retries, connect=retries, read=0, status=retries,
+            status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET", "POST"}),
+            backoff_factor=0.3, raise_on_status=False,
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def verify_key(self, api_key):
+        return self.session.post(
+            f"{self.base_url}/verify-key",
+            headers={"X-Api-Key": api_key},
+            timeout=(self.timeout[0], 5),
+        )
+
+    def ask_stream(self, query, api_key, thread_id=None, last_event_id=None):
+        """Start a research stream, or resume one after `last_event_id` (on the same thread)."""
+        headers = {"X-Api-Key": api_key}
+        if last_event_id:
+            headers["Last-Event-ID"] = last_event_id
+        return self.session.post(
+            f"{self.base_url}/ask_stream",
+            json={"query": query, "thread_id": thread_id},
+            headers=headers,
+            stream=True,
+            timeout=self.timeout,
+        )
+
+
+class EventStream:
+    """
+    Parses a server-sent event response on a daemon thread; iterate to receive the events.
+
+    `resume(last_event_id, thread_id)` should re-open the stream (see BackendClient.ask_stream);
+    it is called when the connection ends before the run's final event.
+    """
+
+    FINAL = ("stats", "error")
+
+    def __init__(self, response, resume=None, attempts=None):
+        self.response = response
+        self.resume = resume
+        self.attempts = int(os.environ.get("BACKEND_RESUME_ATTEMPTS", "3") if attempts is None else attempts)
+        self.resumed = 0
+        self.last_event_id = None
+        self.thread_id = None
+        self.retry_s = 1.0
+        self.events = queue.Queue()
+        self._stopped = threading.Event()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _messages(self, response):
+        """(id, data) per event of one response, until the connection ends."""
+        # SSE is always UTF-8, whatever the Content-Type says
+        response.encoding = "utf-8"
+        event_id, data = None, []
+        for line in response.iter_lines(decode_unicode=True):
+            if self._stopped.is_set():
+                return
+            if not line:
+                if data:
+                    yield event_id, "\n".join(data)
+                event_id, data = None, []
+                continue
+            if line.startswith(":"):
+                # Heartbeat
+                continue
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "id":
+                event_id = value
+            elif field == "data":
+                data.append(value)
+            elif field == "retry" and value.isdigit():
+                self.retry_s = int(value) / 1000
+
+    def _read(self):
+        response = self.response
+        try:
+            while True:
+                try:
+                    for event_id, data in self._messages(response):
+                        try:
+                            event = json.loads(data)
+                        except ValueError:
+                            continue
+                        self.last_event_id = event_id or self.last_event_id
+                        if not isinstance(event, dict) or "type" not in event:
+                            continue
+                        if event["type"] == "thread":
+                            self.thread_id = event.get("data")
+                        self.events.put(event)
+                        if event["type"] in self.FINAL:
+                            return
+                    dropped = ConnectionError("The stream ended before the answer was complete.")
+                except requests.RequestException as e:
+                    dropped = e
+                if self._stopped.is_set():
+                    return
+                if self.resume is None or self.last_event_id is None or self.resumed >= self.attempts:
+                    raise dropped
+                # The run carries on in the backend; pick it up after the last event received
+                self.resumed += 1
+                response.close()
+                time.sleep(self.retry_s)
+                response = self.response = self.resume(self.last_event_id, self.thread_id)
+                if response.status_code != 200:
+                    raise ConnectionError(f"Could not resume the stream (HTTP {response.status_code}).")
+        except Exception as e:
+            # Read timeouts and dropped connections surface in the consumer
+            if not self._stopped.is_set():
+                self.events.put(e)
+        finally:
+            self.events.put(_DONE)
+
+    def __iter__(self):
+        try:
+            while True:
+                item = self.events.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        self._stopped.set()
+        self.response.close()
@@ -0,0 +1,197 @@
+"""
+Golden-output checks and micro-benchmark for the markdown renderer.
+
+Checks `render.to_html` against the previous regex-cascade implementation
+(kept below as `legacy_to_html`) on the syntax both support, checks fenced
+code blocks and inline code against fixed expected output (the old renderer
+split code blocks into one <p> per line and applied bold inside code), and checks that streaming the text in arbitrary chunks
+through MarkdownStream gives the same HTML as rendering it at once. Exits 1
+on any mismatch, then times both renderers.
+
+    python bench_markdown.py --repeat 200
+"""
+import argparse
+import random
+import sys
+import timeit
+
+from render import MarkdownStream, to_html
+
+
+def legacy_to_html(text):
+    """The regex-cascade renderer this module replaced."""
+    import html as _html
+    # We do NOT escape first — LLM output may have intentional < > in code
+    t = text
+
+    # Fenced code blocks ```lang\n...\n```
+    import re as _re
+    t = _re.sub(r'```[\w]*\n(.*?)```', lambda m: '<pre><code>' + _html.escape(m.group(1)) + '</code></pre>', t, flags=_re.DOTALL)
+
+    # Inline code `code`
+    t = _re.sub(r'`([^`]+)`', lambda m: '<code>' + _html.escape(m.group(1)) + '</code>', t)
+
+    # Headers ### ## #
+    t = _re.sub(r'^### (.+)$', r'<h3>\1</h3>', t, flags=_re.MULTILINE)
+    t = _re.sub(r'^## (.+)$',  r'<h2>\1</h2>', t, flags=_re.MULTILINE)
+    t = _re.sub(r'^# (.+)$',   r'<h1>\1</h1>', t, flags=_re.MULTILINE)
+
+    # Bold **text** and __text__
+    t = _re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', t)
+    t = _re.sub(r'__(.+?)__',          r'<strong>\1</strong>', t)
+
+    # Italic *text* and _text_
+    t = _re.sub(r'\*([^\*\n]+?)\*', r'<em>\1</em>', t)
+    t = _re.sub(r'(?<![_])_([^_\n]+?)_(?![_])', r'<em>\1</em>', t)
+
+    # Links [text](url)
+    t = _re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<a href="\2" target="_blank">\1</a>', t)
+
+    # Process line by line for lists and paragraphs
+    lines = t.split('\n')
+    result = []
+    in_ul = False
+    in_ol = False
+
+    for line in lines:
+        # Unordered list: - item or * item
+        ul_match = _re.match(r'^[\s]*[-*•] (.+)$', line)
+        ol_match = _re.match(r'^[\s]*(\d+)\. (.+)$', line)
+
+        if ul_match:
+            if in_ol:
+                result.append('</ol>'); in_ol = False
+            if not in_ul:
+                result.append('<ul>'); in_ul = True
+            result.append(f'<li>{ul_match.group(1)}</li>')
+        elif ol_match:
+            if in_ul:
+                result.append('</ul>'); in_ul = False
+            if not in_ol:
+                result.append('<ol>'); in_ol = True
+            result.append(f'<li>{ol_match.group(2)}</li>')
+        else:
+            if in_ul:
+                result.append('</ul>'); in_ul = False
+            if in_ol:
+                result.append('</ol>'); in_ol = False
+
+            stripped = line.strip()
+            if stripped == '':
+                result.append('<br>')
+            elif stripped.startswith('<h') or stripped.startswith('<pre') or stripped.startswith('<ul') or stripped.startswith('<ol'):
+                result.append(stripped)
+            else:
+                result.append(f'<p>{stripped}</p>')
+
+    if in_ul: result.append('</ul>')
+    if in_ol: result.append('</ol>')
+
+    return '\n'.join(result)
+
+
+GOLDEN = [
+    "plain sentence",
+    "# Title\n## Section\n### Sub",
+    "#### not a header",
+    "**bold** and __also bold__ then *em* and _em_",
+    "snake_case_name stays mostly literal",
+    "See [the paper](https://arxiv.org/abs/1706.03762) for details.",
+    "[**bold link**](https://example.com)",
+    "- one\n- two\n* three\n• four",
+    "1. first\n2. second\n10. tenth",
+    "- bullet\n1. number\ntext after",
+    "para one\n\npara two\n",
+    "  indented line  ",
+    "### **Key** findings\n\n1. Dense retrieval\n2. *Hybrid* search\n\nDone.",
+    "<h4>raw html header</h4>",
+    "",
+    "\n\n",
+]
+
+FIXED = {
+    "Inline `x < y && **z**` code":
+        "<p>Inline <code>x &lt; y &amp;&amp; **z**</code> code</p>",
+    "```python\nx = 1\nif x < 2:\n    print(x)\n```":
+        "<pre><code>x = 1&#10;if x &lt; 2:&#10;    print(x)</code></pre>",
+    "Before\n```\na\n\nb\n```\nAfter":
+        "<p>Before</p>\n<pre><code>a&#10;&#10;b</code></pre>\n<p>After</p>",
+    "- item\n```\n**not bold**\n```":
+        "<ul>\n<li>item</li>\n</ul>\n<pre><code>**not bold**</code></pre>",
+    "```\nunterminated <b>":
+        "<pre><code>unterminated &lt;b&gt;</code></pre>",
+}
+
+LONG_ANSWER = "\n".join([
+    "## Overview",
+    "Recent work on **retrieval-augmented generation** shows that `top_k` matters, see [survey](https://arxiv.org/abs/2312.10997).",
+    "",
+    "1. Dense retrievers beat *BM25* on most benchmarks",
+    "2. Hybrid search closes the gap",
+    "",
+    "```python",
+    *[f"    score_{i} = retriever.score(query, docs[{i}])  # rank <= {i}" for i in range(80)],
+    "```",
+    "",
+    *[f"- Finding {i}: __recall__ improves with *reranking* and `cache` reuse" for i in range(40)],
+]) * 3
+
+
+def check():
+    failures = []
+    for text in GOLDEN:
+        if to_html(text) != legacy_to_html(text):
+            failures.append(("golden", text, legacy_to_html(text), to_html(text)))
+    for text, expected in FIXED.items():
+        if to_html(text) != expected:
+            failures.append(("fenced", text, expected, to_html(text)))
+    rng = random.Random(0)
+    for text in [*GOLDEN, *FIXED, LONG_ANSWER]:
+        stream, pos = MarkdownStream(), 0
+        while pos < len(text):
+            step = rng.randint(1, 12)
+            stream.feed(text[pos:pos + step])
+            pos += step
+            partial = stream.html()
+            if partial != to_html(text[:pos]):
+                failures.append(("stream", text[:pos], to_html(text[:pos]), partial))
+                break
+    for kind, text, expected, got in failures:
+        print(f"[{kind}] {text!r}\n  expected: {expected!r}\n  got:      {got!r}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown renderer golden checks and micro-benchmark")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if not check():
+        sys.exit(1)
+    print(f"golden checks passed ({len(GOLDEN)} golden, {len(FIXED)} fixed, streaming)")
+
+    print(f"answer: {len(LONG_ANSWER)} chars, {LONG_ANSWER.count(chr(10)) + 1} lines")
+    for name, fn in [("legacy", legacy_to_html), ("single-pass", to_html)]:
+        per_call = timeit.timeit(lambda: fn(LONG_ANSWER), number=args.repeat) / args.repeat
+        print(f"{name:>12}: {per_call * 1000:.3f} ms/render")
+
+    # Streaming: redraw after every 40 characters, as the frontend does while tokens arrive
+    chunks = [LONG_ANSWER[i:i + 40] for i in range(0, len(LONG_ANSWER), 40)]
+
+    def full_rerender():
+        text = ""
+        for chunk in chunks:
+            text += chunk
+            to_html(text)
+
+    def incremental():
+        stream = MarkdownStream()
+        for chunk in chunks:
+            stream.feed(chunk).html()
+
+    for name, fn in [("full re-render", full_rerender), ("incremental", incremental)]:
+        print(f"{name:>15}: {timeit.timeit(fn, number=1) * 1000:.1f} ms for {len(chunks)} redraws")
+
+
+if __name__ == "__main__":
+    main()
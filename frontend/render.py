@@ -0,0 +1,241 @@
+"""
+Chat panel rendering and session containers, kept free of Streamlit so they can be benchmarked.
+
+Every stream event redraws the whole panel. Past messages never change, so
+`ChatHistory` renders each one when it is appended and keeps the joined
+HTML; a redraw only renders the live tail. Only the last page of history is
+sent to the browser.
+"""
+import html
+import re
+from collections import deque
+from itertools import islice
+
+FENCE = "```"
+HEADER = re.compile(r"^(#{1,3}) (.+)$")
+UL_ITEM = re.compile(r"^\s*[-*•] (.+)$")
+OL_ITEM = re.compile(r"^\s*\d+\. (.+)$")
+FENCE_OPEN = re.compile(r"^```\w*$")
+INLINE = re.compile(
+    r"`(?P<code>[^`]+)`"
+    r"|\*\*(?P<bold>.+?)\*\*"
+    r"|__(?P<bold_u>.+?)__"
+    r"|\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)]+)\)"
+    r"|\*(?P<em>[^*\n]+?)\*"
+    r"|(?<!_)_(?P<em_u>[^_\n]+?)_(?!_)"
+)
+# Lines that already are block HTML are passed through without a <p>
+BLOCK_HTML = ("<h", "<pre", "<ul", "<ol")
+
+
+def _inline_sub(m):
+    kind = m.lastgroup
+    if kind == "code":
+        return f"<code>{html.escape(m['code'])}</code>"
+    if kind in ("bold", "bold_u"):
+        return f"<strong>{inline(m[kind])}</strong>"
+    if kind in ("em", "em_u"):
+        return f"<em>{inline(m[kind])}</em>"
+    return f'<a href="{m["link_url"]}" target="_blank">{inline(m["link_text"])}</a>'
+
+
+def inline(text):
+    """Inline code, bold, italic and links in one left-to-right scan."""
+    return INLINE.sub(_inline_sub, text)
+
+
+class MarkdownStream:
+    """
+    Line-at-a-time markdown renderer for an append-only text stream.
+
+    Completed lines are rendered once as they arrive; `html()` only renders
+    the pending partial line and closes any open list or code block.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._list = None
+        self._code = None
+        self._pending = ""
+
+    def feed(self, chunk):
+        *lines, self._pending = (self._pending + chunk).split("\n")
+        for line in lines:
+            self._line(line)
+        return self
+
+    def html(self):
+        saved = self._parts, self._list, self._code
+        self._parts = []
+        if self._code is not None:
+            self._code = list(self._code)
+        try:
+            self._line(self._pending)
+            self._close()
+            return "\n".join(saved[0] + self._parts)
+        finally:
+            self._parts, self._list, self._code = saved
+
+    def _set_list(self, kind):
+        if self._list != kind:
+            if self._list:
+                self._parts.append(f"</{self._list}>")
+            if kind:
+                self._parts.append(f"<{kind}>")
+            self._list = kind
+
+    def _close(self):
+        if self._code is not None:
+            self._end_code()
+        self._set_list(None)
+
+    def _end_code(self):
+        # &#10; keeps blank code lines from ending Streamlit's HTML block
+        self._parts.append("<pre><code>" + "&#10;".join(self._code) + "</code></pre>")
+        self._code = None
+
+    def _line(self, line):
+        if self._code is not None:
+            if FENCE in line:
+                code = line.partition(FENCE)[0]
+                if code:
+                    self._code.append(html.escape(code))
+                self._end_code()
+            else:
+                self._code.append(html.escape(line))
+            return
+
+        stripped = line.strip()
+        if FENCE_OPEN.match(stripped):
+            self._set_list(None)
+            self._code = []
+            return
+
+        m = UL_ITEM.match(line)
+        if m:
+            self._set_list("ul")
+            self._parts.append(f"<li>{inline(m[1])}</li>")
+            return
+        m = OL_ITEM.match(line)
+        if m:
+            self._set_list("ol")
+            self._parts.append(f"<li>{inline(m[1])}</li>")
+            return
+
+        self._set_list(None)
+        m = HEADER.match(line)
+        if m:
+            level = len(m[1])
+            self._parts.append(f"<h{level}>{inline(m[2])}</h{level}>")
+        elif not stripped:
+            self._parts.append("<br>")
+        elif stripped.startswith(BLOCK_HTML):
+            self._parts.append(inline(stripped))
+        else:
+            self._parts.append(f"<p>{inline(stripped)}</p>")
+
+
+def to_html(text):
+    """Convert markdown to HTML using stdlib only — no external packages."""
+    return MarkdownStream().feed(text).html()
+
+
+def message_html(role, msg):
+    if role == "user":
+        return f'<div class="msg-user">{msg}</div>'
+    return f'<div class="msg-agent">{to_html(msg)}</div>'
+
+
+class ChatHistory:
+    """
+    Chat messages with their rendered HTML, memoized per message.
+
+    Keeps at most `max_messages`, dropping the oldest; the backend thread
+    still holds the full conversation.
+    """
+
+    def __init__(self, max_messages=500):
+        self.messages = deque(maxlen=max_messages)
+        self._parts = deque(maxlen=max_messages)
+        self._appended = 0
+        self._joined = ""
+        self._joined_key = None
+
+    def append(self, role, msg):
+        self.messages.append((role, msg))
+        self._parts.append(message_html(role, msg))
+        self._appended += 1
+
+    def hidden(self, limit):
+        """Number of messages older than the last `limit`."""
+        return max(0, len(self._parts) - limit)
+
+    def html(self, limit=None):
+        """Joined HTML of the last `limit` messages (all when None)."""
+        key = (self._appended, limit)
+        if self._joined_key != key:
+            start = 0 if limit is None else self.hidden(limit)
+            self._joined = "".join(islice(self._parts, start, None))
+            self._joined_key = key
+        return self._joined
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+
+class SourceSet:
+    """Insertion-ordered set of sources keyed by URL (title when there is none), capped by evicting the oldest."""
+
+    def __init__(self, max_sources=500):
+        self.max_sources = max_sources
+        self._sources = {}
+
+    @staticmethod
+    def key(source):
+        return source.get("url") or source.get("title")
+
+    def add(self, source):
+        key = self.key(source)
+        if not key or key in self._sources:
+            return
+        self._sources[key] = source
+        if len(self._sources) > self.max_sources:
+            del self._sources[next(iter(self._sources))]
+
+    def update(self, sources):
+        for source in sources:
+            self.add(source)
+
+    def first(self, n):
+        return list(islice(self._sources.values(), n))
+
+    def __contains__(self, source):
+        return self.key(source) in self._sources
+
+    def __len__(self):
+        return len(self._sources)
+
+
+EMPTY_STATE = """
+        <div class="empty-state">
+          <div class="empty-hex">⬡</div>
+          <div class="empty-text">Nexus is standing by</div>
+          <div class="empty-sub">Ask anything — science, news, research</div>
+        </div>"""
+
+
+def build_panel(history, new_query="", live_html="", limit=None):
+    """Renders the entire chat panel as one HTML block so ordering is always correct."""
+    if not history and not new_query:
+        body = EMPTY_STATE
+    else:
+        body = history.html(limit)
+        if new_query:
+            body += message_html("user", new_query)
+        if live_html:
+            body += live_html
+
+    return f'<div class="nx-panel" id="nx-chat">{body}</div>'
@@ -0,0 +1,67 @@
+"""
+The Streamlit app driven by AppTest against a stub backend.
+
+    cd frontend && python -m pytest -q tests
+"""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+EVENTS = [
+    {"type": "thread", "data": "t1"},
+    {"type": "answer_delta", "data": "Resumed "},
+    {"type": "answer_delta", "data": "answer"},
+    {"type": "answer", "data": "Resumed answer"},
+    {"type": "stats", "data": {"ttfb_ms": 1, "ttft_ms": 2}},
+]
+
+
+class DroppingBackend(BaseHTTPRequestHandler):
+    """/ask_stream that hangs up after two events, then serves the rest to a request with Last-Event-ID."""
+
+    protocol_version = "HTTP/1.0"
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        last = self.headers.get("Last-Event-ID")
+        self.requests.append((self.headers.get("X-Api-Key"), last, body))
+        start = int(last.rpartition(":")[2]) + 1 if last else 0
+        stop = len(EVENTS) if last else 2
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        self.wfile.write(b"retry: 10\n\n")
+        for seq in range(start, stop):
+            self.wfile.write(f"id: run1:{seq}\ndata: {json.dumps(EVENTS[seq])}\n\n".encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DroppingBackend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("NEXUS_BACKEND_URL", f"http://127.0.0.1:{server.server_port}")
+    DroppingBackend.requests = []
+    yield DroppingBackend
+    server.shutdown()
+
+
+def test_dropped_stream_is_resumed_from_the_reader_thread(backend):
+    at = AppTest.from_file(APP, default_timeout=30)
+    at.session_state["authenticated"] = True
+    at.session_state["api_key"] = "secret"
+    at.run()
+    at.chat_input[0].set_value("what is bm25").run()
+
+    assert not at.exception
+    assert list(at.session_state["chat"])[-1] == ("assistant", "Resumed answer")
+    assert [(key, last) for key, last, _ in backend.requests] == [("secret", None), ("secret", "run1:1")]
+    assert backend.requests[1][2]["thread_id"] == "t1"